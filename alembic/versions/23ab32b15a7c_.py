@@ -0,0 +1,43 @@
+"""add user and program set to predictions
+
+Revision ID: 23ab32b15a7c
+Revises: 8838298fd128
+Create Date: 2026-10-18 18:12:47.305519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '23ab32b15a7c'
+down_revision: Union[str, None] = '8838298fd128'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('predictions') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+        batch_op.add_column(sa.Column('program_set_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('unit_id', sa.Integer(), nullable=True))
+        batch_op.alter_column('prediction', existing_type=sa.Integer(), type_=sa.Float(), existing_nullable=False)
+        batch_op.create_foreign_key('fk_predictions_user_id_users', 'users', ['user_id'], ['id'])
+        batch_op.create_foreign_key('fk_predictions_program_set_id_program_sets', 'program_sets', ['program_set_id'],
+                                    ['id'])
+        batch_op.create_foreign_key('fk_predictions_unit_id_unit_types', 'unit_types', ['unit_id'], ['id'])
+        batch_op.create_index('ix_predictions_user_id_program_set_id', ['user_id', 'program_set_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('predictions') as batch_op:
+        batch_op.drop_index('ix_predictions_user_id_program_set_id')
+        batch_op.drop_constraint('fk_predictions_unit_id_unit_types', type_='foreignkey')
+        batch_op.drop_constraint('fk_predictions_program_set_id_program_sets', type_='foreignkey')
+        batch_op.drop_constraint('fk_predictions_user_id_users', type_='foreignkey')
+        batch_op.alter_column('prediction', existing_type=sa.Float(), type_=sa.Integer(), existing_nullable=False)
+        batch_op.drop_column('unit_id')
+        batch_op.drop_column('program_set_id')
+        batch_op.drop_column('user_id')
@@ -0,0 +1,50 @@
+"""add user metric summary
+
+Revision ID: 3a87325cd2e2
+Revises: 82e602738875
+Create Date: 2026-10-18 14:31:47.905126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '3a87325cd2e2'
+down_revision: Union[str, None] = '82e602738875'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_metric_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('program_day_id', sa.Integer(), nullable=False),
+    sa.Column('exercise', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('metric', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('unit_id', sa.Integer(), nullable=True),
+    sa.Column('latest_date', sa.Date(), nullable=False),
+    sa.Column('latest_set_id', sa.Integer(), nullable=False),
+    sa.Column('latest', sa.Float(), nullable=False),
+    sa.Column('prev', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('mean', sa.Float(), nullable=False),
+    sa.Column('m2', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['program_day_id'], ['program_days.id'], ),
+    sa.ForeignKeyConstraint(['unit_id'], ['unit_types.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_user_metric_summary_user_id_program_day_id', 'user_metric_summary',
+                    ['user_id', 'program_day_id', 'exercise', 'metric'], unique=True)
+    # The summary is built from the metrics of newly processed sets, reset the watermarks so the next run
+    # of calculate_metrics rebuilds it from the full history
+    op.execute('DELETE FROM user_metrics_watermark')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_metric_summary_user_id_program_day_id', table_name='user_metric_summary')
+    op.drop_table('user_metric_summary')
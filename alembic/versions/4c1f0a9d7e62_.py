@@ -0,0 +1,36 @@
+"""unique input features
+
+Revision ID: 4c1f0a9d7e62
+Revises: a8536116e5b5
+Create Date: 2026-10-18 21:04:12.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1f0a9d7e62'
+down_revision: Union[str, None] = 'a8536116e5b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FEATURES = ['reps', 'reps_max', 'reps_min', 'rpe', 'set_number']
+
+
+def upgrade() -> None:
+    # Predictions of a duplicated feature row move to its first copy before the others are deleted
+    same_features = ' AND '.join(f'kept.{name} = duplicated.{name}' for name in FEATURES)
+    op.execute('UPDATE predictions SET input_id = ('
+               'SELECT min(kept.id) FROM input_features kept JOIN input_features duplicated '
+               f'ON {same_features} WHERE duplicated.id = predictions.input_id)')
+    op.execute('DELETE FROM input_features WHERE id NOT IN ('
+               f"SELECT min(id) FROM input_features GROUP BY {', '.join(FEATURES)})")
+    op.create_index('ix_input_features_reps_reps_max_reps_min_rpe_set_number', 'input_features', FEATURES,
+                    unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_input_features_reps_reps_max_reps_min_rpe_set_number', table_name='input_features')
@@ -0,0 +1,26 @@
+"""add user clients lookup index
+
+Revision ID: 7e5868937162
+Revises: b00f8a480ce3
+Create Date: 2026-10-18 16:31:08.915337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '7e5868937162'
+down_revision: Union[str, None] = 'b00f8a480ce3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_clients_user_id_client_id', 'user_clients', ['user_id', 'client_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_clients_user_id_client_id', table_name='user_clients')
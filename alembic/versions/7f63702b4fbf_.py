@@ -0,0 +1,40 @@
+"""add user indicator payloads
+
+Revision ID: 7f63702b4fbf
+Revises: e6e0fc7c04e1
+Create Date: 2026-10-18 15:27:10.214877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '7f63702b4fbf'
+down_revision: Union[str, None] = 'e6e0fc7c04e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_indicator_payloads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('program_day_id', sa.Integer(), nullable=False),
+    sa.Column('exercise', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('payload', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.ForeignKeyConstraint(['program_day_id'], ['program_days.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_user_indicator_payloads_user_id_program_day_id', 'user_indicator_payloads',
+                    ['user_id', 'program_day_id', 'exercise'], unique=True)
+    # Without a watermark the next run of calculate_metrics rebuilds the user's summary and payloads
+    op.execute('DELETE FROM user_metrics_watermark')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_indicator_payloads_user_id_program_day_id', table_name='user_indicator_payloads')
+    op.drop_table('user_indicator_payloads')
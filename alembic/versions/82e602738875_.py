@@ -0,0 +1,38 @@
+"""add metrics watermark
+
+Revision ID: 82e602738875
+Revises: 9e595e4ca51b
+Create Date: 2026-10-18 14:05:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '82e602738875'
+down_revision: Union[str, None] = '9e595e4ca51b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_metrics_watermark',
+    sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('last_set_id', sa.Integer(), nullable=False),
+    sa.Column('updated', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Earlier runs of calculate_metrics inserted a new copy of every metric on each run, keep the newest one
+    op.execute('DELETE FROM user_workout_metrics WHERE id NOT IN '
+               '(SELECT MAX(id) FROM user_workout_metrics GROUP BY set_id, metric)')
+    op.create_index('ix_user_workout_metrics_set_id_metric', 'user_workout_metrics', ['set_id', 'metric'],
+                    unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_workout_metrics_set_id_metric', table_name='user_workout_metrics')
+    op.drop_table('user_metrics_watermark')
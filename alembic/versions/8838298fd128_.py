@@ -0,0 +1,38 @@
+"""add exercise rep range stats
+
+Revision ID: 8838298fd128
+Revises: 7e5868937162
+Create Date: 2026-10-18 16:52:19.604728
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '8838298fd128'
+down_revision: Union[str, None] = '7e5868937162'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('exercise_rep_range_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.Column('min_reps', sa.Integer(), nullable=False),
+    sa.Column('max_reps', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('percent', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_exercise_rep_range_stats_exercise_id', 'exercise_rep_range_stats',
+                    ['exercise_id', 'min_reps', 'max_reps'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_exercise_rep_range_stats_exercise_id', table_name='exercise_rep_range_stats')
+    op.drop_table('exercise_rep_range_stats')
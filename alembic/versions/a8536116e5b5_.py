@@ -0,0 +1,60 @@
+"""key metric summaries and indicator payloads by program history
+
+Revision ID: a8536116e5b5
+Revises: e38a588b4dd3
+Create Date: 2026-10-18 19:12:27.540193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8536116e5b5'
+down_revision: Union[str, None] = 'e38a588b4dd3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The summaries mixed every block of a program, clearing the watermarks makes calculate_metrics rebuild them
+    op.execute('DELETE FROM user_indicator_payloads')
+    op.execute('DELETE FROM user_metric_summary')
+    op.execute('DELETE FROM user_metrics_watermark')
+    with op.batch_alter_table('user_metric_summary', recreate='always') as batch_op:
+        batch_op.drop_index('ix_user_metric_summary_user_id_program_day_id')
+        batch_op.add_column(sa.Column('user_program_history_id', sa.Integer(), nullable=False))
+        batch_op.create_foreign_key('fk_user_metric_summary_user_program_history_id_user_program_history',
+                                    'user_program_history', ['user_program_history_id'], ['id'])
+        batch_op.create_index('ix_user_metric_summary_user_id_user_program_history_id',
+                              ['user_id', 'user_program_history_id', 'program_day_id', 'exercise', 'metric'],
+                              unique=True)
+    with op.batch_alter_table('user_indicator_payloads', recreate='always') as batch_op:
+        batch_op.drop_index('ix_user_indicator_payloads_user_id_program_day_id')
+        batch_op.add_column(sa.Column('user_program_history_id', sa.Integer(), nullable=False))
+        batch_op.create_foreign_key('fk_user_indicator_payloads_user_program_history_id_user_program_history',
+                                    'user_program_history', ['user_program_history_id'], ['id'])
+        batch_op.create_index('ix_user_indicator_payloads_user_id_user_program_history_id',
+                              ['user_id', 'user_program_history_id', 'program_day_id', 'exercise'], unique=True)
+
+
+def downgrade() -> None:
+    op.execute('DELETE FROM user_indicator_payloads')
+    op.execute('DELETE FROM user_metric_summary')
+    op.execute('DELETE FROM user_metrics_watermark')
+    with op.batch_alter_table('user_indicator_payloads', recreate='always') as batch_op:
+        batch_op.drop_index('ix_user_indicator_payloads_user_id_user_program_history_id')
+        batch_op.drop_constraint('fk_user_indicator_payloads_user_program_history_id_user_program_history',
+                                 type_='foreignkey')
+        batch_op.drop_column('user_program_history_id')
+        batch_op.create_index('ix_user_indicator_payloads_user_id_program_day_id',
+                              ['user_id', 'program_day_id', 'exercise'], unique=True)
+    with op.batch_alter_table('user_metric_summary', recreate='always') as batch_op:
+        batch_op.drop_index('ix_user_metric_summary_user_id_user_program_history_id')
+        batch_op.drop_constraint('fk_user_metric_summary_user_program_history_id_user_program_history',
+                                 type_='foreignkey')
+        batch_op.drop_column('user_program_history_id')
+        batch_op.create_index('ix_user_metric_summary_user_id_program_day_id',
+                              ['user_id', 'program_day_id', 'exercise', 'metric'], unique=True)
@@ -0,0 +1,28 @@
+"""add id to the workouts lookup index
+
+Revision ID: b00f8a480ce3
+Revises: 7f63702b4fbf
+Create Date: 2026-10-18 16:05:41.382610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'b00f8a480ce3'
+down_revision: Union[str, None] = '7f63702b4fbf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_workouts_user_id_date_id', 'workouts', ['user_id', 'date', 'id'], unique=False)
+    op.drop_index('ix_workouts_user_id_date', table_name='workouts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_workouts_user_id_date', 'workouts', ['user_id', 'date'], unique=False)
+    op.drop_index('ix_workouts_user_id_date_id', table_name='workouts')
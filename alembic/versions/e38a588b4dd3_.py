@@ -0,0 +1,27 @@
+"""add program history prediction lookup index
+
+Revision ID: e38a588b4dd3
+Revises: 23ab32b15a7c
+Create Date: 2026-10-18 18:02:41.306518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'e38a588b4dd3'
+down_revision: Union[str, None] = '23ab32b15a7c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_program_history_prediction_user_program_history_id', 'program_history_prediction',
+                    ['user_program_history_id', 'program_day_id', 'exercise_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_program_history_prediction_user_program_history_id', table_name='program_history_prediction')
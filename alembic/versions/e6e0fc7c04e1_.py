@@ -0,0 +1,34 @@
+"""add lookup indexes
+
+Revision ID: e6e0fc7c04e1
+Revises: 3a87325cd2e2
+Create Date: 2026-10-18 15:02:33.671840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6e0fc7c04e1'
+down_revision: Union[str, None] = '3a87325cd2e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_workouts_user_id_date', 'workouts', ['user_id', 'date'], unique=False)
+    op.create_index('ix_workout_sets_workout_id', 'workout_sets', ['workout_id'], unique=False)
+    op.create_index('ix_user_workout_metrics_user_id_set_id', 'user_workout_metrics', ['user_id', 'set_id'],
+                    unique=False)
+    op.create_index('ix_user_program_history_user_id_current', 'user_program_history', ['user_id', 'current'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_program_history_user_id_current', table_name='user_program_history')
+    op.drop_index('ix_user_workout_metrics_user_id_set_id', table_name='user_workout_metrics')
+    op.drop_index('ix_workout_sets_workout_id', table_name='workout_sets')
+    op.drop_index('ix_workouts_user_id_date', table_name='workouts')
@@ -1,6 +1,7 @@
 import datetime
 from datetime import date
 import reflex as rx
+from sqlalchemy import Index
 from sqlmodel import Field, Column, Date, Relationship
 from typing import Optional, List
 
@@ -24,6 +25,8 @@ class Exercise(rx.Model, table=True):
 
 class InputFeatures(rx.Model, table=True):
     __tablename__ = "input_features"
+    __table_args__ = (Index('ix_input_features_reps_reps_max_reps_min_rpe_set_number', 'reps', 'reps_max', 'reps_min',
+                            'rpe', 'set_number', unique=True),)
 
     id: int = Field(primary_key=True)
     reps: int
@@ -35,14 +38,18 @@ class InputFeatures(rx.Model, table=True):
 
 class Prediction(rx.Model, table=True):
     __tablename__ = "predictions"
+    __table_args__ = (Index('ix_predictions_user_id_program_set_id', 'user_id', 'program_set_id'),)
 
     id: int = Field(primary_key=True)
     input_id: int = Field(foreign_key='input_features.id')
     exercise: int = Field(foreign_key='exercises.id')
     model: str
-    prediction: int
+    prediction: float
     user_agrees: bool
     user_suggestion: Optional[int]
+    user_id: Optional[str] = Field(foreign_key='users.id')
+    program_set_id: Optional[int] = Field(foreign_key='program_sets.id')
+    unit_id: Optional[int] = Field(foreign_key='unit_types.id')
 
 
 class Program(rx.Model, table=True):
@@ -86,6 +93,19 @@ class ProgramSet(rx.Model, table=True):
     amrap: bool
 
 
+class ExerciseRepRangeStats(rx.Model, table=True):
+    __tablename__ = 'exercise_rep_range_stats'
+    __table_args__ = (Index('ix_exercise_rep_range_stats_exercise_id', 'exercise_id', 'min_reps', 'max_reps',
+                            unique=True),)
+
+    id: int = Field(primary_key=True)
+    exercise_id: int = Field(foreign_key='exercises.id')
+    min_reps: int
+    max_reps: int
+    count: int
+    percent: float
+
+
 class User(rx.Model, table=True):
     __tablename__ = "users"
 
@@ -103,6 +123,7 @@ class User(rx.Model, table=True):
 
 class UserClients(rx.Model, table=True):
     __tablename__ = 'user_clients'
+    __table_args__ = (Index('ix_user_clients_user_id_client_id', 'user_id', 'client_id'),)
 
     id: int = Field(primary_key=True)
     user_id: str = Field(foreign_key='users.id')
@@ -111,6 +132,7 @@ class UserClients(rx.Model, table=True):
 
 class UserProgramHistory(rx.Model, table=True):
     __tablename__ = "user_program_history"
+    __table_args__ = (Index('ix_user_program_history_user_id_current', 'user_id', 'current'),)
 
     id: int = Field(primary_key=True)
     user_id: str = Field(foreign_key='users.id')
@@ -126,6 +148,8 @@ class UserProgramHistory(rx.Model, table=True):
 
 class UserProgramHistoryPrediction(rx.Model, table=True):
     __tablename__ = "program_history_prediction"
+    __table_args__ = (Index('ix_program_history_prediction_user_program_history_id', 'user_program_history_id',
+                            'program_day_id', 'exercise_id', unique=True),)
 
     id: int = Field(primary_key=True)
     user_program_history_id: int = Field(foreign_key='user_program_history.id')
@@ -164,6 +188,7 @@ class UnitConversion(rx.Model, table=True):
 
 class Workout(rx.Model, table=True):
     __tablename__ = 'workouts'
+    __table_args__ = (Index('ix_workouts_user_id_date_id', 'user_id', 'date', 'id'),)
 
     id: int = Field(primary_key=True)
     complete: bool
@@ -179,6 +204,7 @@ class Workout(rx.Model, table=True):
 
 class WorkoutSet(rx.Model, table=True):
     __tablename__ = 'workout_sets'
+    __table_args__ = (Index('ix_workout_sets_workout_id', 'workout_id'),)
 
     id: int = Field(primary_key=True)
     workout_id: int = Field(foreign_key='workouts.id')
@@ -206,6 +232,8 @@ class WorkoutComment(rx.Model, table=True):
 
 class UserWorkoutMetrics(rx.Model, table=True):
     __tablename__ = 'user_workout_metrics'
+    __table_args__ = (Index('ix_user_workout_metrics_set_id_metric', 'set_id', 'metric', unique=True),
+                      Index('ix_user_workout_metrics_user_id_set_id', 'user_id', 'set_id'))
 
     id: int = Field(primary_key=True)
     user_id: str = Field(foreign_key="users.id")
@@ -217,3 +245,45 @@ class UserWorkoutMetrics(rx.Model, table=True):
     exercise: str
     metric: str
     value: float
+
+
+class UserMetricsWatermark(rx.Model, table=True):
+    __tablename__ = 'user_metrics_watermark'
+
+    user_id: str = Field(primary_key=True, foreign_key='users.id')
+    last_set_id: int
+    updated: datetime.datetime
+
+
+class UserMetricSummary(rx.Model, table=True):
+    __tablename__ = 'user_metric_summary'
+    __table_args__ = (Index('ix_user_metric_summary_user_id_user_program_history_id', 'user_id',
+                            'user_program_history_id', 'program_day_id', 'exercise', 'metric', unique=True),)
+
+    id: int = Field(primary_key=True)
+    user_id: str = Field(foreign_key='users.id')
+    user_program_history_id: int = Field(foreign_key='user_program_history.id')
+    program_day_id: int = Field(foreign_key='program_days.id')
+    exercise: str
+    metric: str
+    unit_id: Optional[int] = Field(foreign_key='unit_types.id')
+    latest_date: datetime.date
+    latest_set_id: int
+    latest: float
+    prev: float
+    count: int
+    mean: float
+    m2: float
+
+
+class UserIndicatorPayload(rx.Model, table=True):
+    __tablename__ = 'user_indicator_payloads'
+    __table_args__ = (Index('ix_user_indicator_payloads_user_id_user_program_history_id', 'user_id',
+                            'user_program_history_id', 'program_day_id', 'exercise', unique=True),)
+
+    id: int = Field(primary_key=True)
+    user_id: str = Field(foreign_key='users.id')
+    user_program_history_id: int = Field(foreign_key='user_program_history.id')
+    program_day_id: int = Field(foreign_key='program_days.id')
+    exercise: str
+    payload: str
@@ -0,0 +1,92 @@
+"""Rolling training load analytics of every user and exercise, computed with vectorized window operations.
+
+The load of a day is the weight * num_sets of all the sets of the exercise that day, in the unit of the exercise's
+latest set, and days without a set count as zero load:
+
+- ACWR, the acute:chronic workload ratio: the mean daily load of the last ACUTE_DAYS over the mean daily load of the
+  last CHRONIC_DAYS. Only reported once the exercise has CHRONIC_DAYS of history.
+- Monotony: the mean daily load of the last ACUTE_DAYS over its standard deviation.
+- Strain: the load of the last ACUTE_DAYS times its monotony, in the load's unit.
+
+These are stored against the last set of the exercise on each day. E1RM, the one rep max estimated from the weight,
+reps per set and RPE, is stored against every set in the set's unit.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from base45reflex.predictions import estimate_1rm
+from base45reflex.reference import ReferenceData
+from base45reflex.units import convert
+
+SET_ANALYTICS = ('E1RM',)
+DAY_ANALYTICS = ('ACWR', 'Monotony', 'Strain')
+ANALYTICS = (*SET_ANALYTICS, *DAY_ANALYTICS)
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+# Days of sets before the first new one that the windows of the new days reach back over
+LOOKBACK_DAYS = CHRONIC_DAYS - 1
+
+KEYS = ['user_id', 'exercise']
+COLUMNS = ['set_id', 'date', 'exercise', 'unit_id', 'metric', 'value', 'user_id']
+
+
+def set_analytics(sets: pd.DataFrame) -> pd.DataFrame:
+    """One E1RM row per set, sets without an RPE are left out."""
+    value = estimate_1rm(sets['weight'], sets['reps'] / sets['num_sets'], sets['avg_rpe'])
+    rows = sets.assign(metric='E1RM', value=value)
+    return rows.dropna(subset=['value'])[COLUMNS]
+
+
+def daily_loads(sets: pd.DataFrame, reference: ReferenceData) -> pd.DataFrame:
+    """The load of every user, exercise and training day, with the last set of the day, sorted by day."""
+    sets = sets.sort_values(['date', 'set_id'])
+    target_unit = sets.groupby(KEYS)['unit_id'].transform('last')
+    sets = sets.assign(load=convert(sets['weight'] * sets['num_sets'], sets['unit_id'], target_unit, reference),
+                       unit_id=target_unit, date=pd.to_datetime(sets['date']))
+    days = sets.groupby([*KEYS, 'date']).agg(load=('load', 'sum'), set_id=('set_id', 'last'),
+                                             unit_id=('unit_id', 'last'))
+    return days.reset_index()
+
+
+def day_analytics(days: pd.DataFrame, first_dates: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """The ACWR, Monotony and Strain rows of every training day of the daily loads.
+
+    first_dates has the first training day of the exercises, by user_id and exercise, when the daily loads only cover
+    the end of their history.
+    """
+    days = days.sort_values([*KEYS, 'date'], ignore_index=True)
+    # Time based windows only hold the training days, so sums over them count rest days as zero
+    by_day = days.assign(load_sq=days['load'] ** 2).set_index('date').groupby(KEYS)
+    acute = by_day['load'].rolling(f'{ACUTE_DAYS}D').sum().to_numpy()
+    acute_sq = by_day['load_sq'].rolling(f'{ACUTE_DAYS}D').sum().to_numpy()
+    chronic = by_day['load'].rolling(f'{CHRONIC_DAYS}D').sum().to_numpy()
+
+    first = days.groupby(KEYS)['date'].transform('min')
+    if first_dates is not None:
+        earlier = pd.to_datetime(days[KEYS].merge(first_dates, on=KEYS, how='left')['first_date'])
+        first = first.where(earlier.isna() | (earlier > first), earlier)
+    history = (days['date'] - first).dt.days.to_numpy()
+    usable = (history >= CHRONIC_DAYS - 1) & (chronic > 0)
+    acwr = np.where(usable, (acute / ACUTE_DAYS) / np.where(usable, chronic / CHRONIC_DAYS, 1), np.nan)
+
+    mean = acute / ACUTE_DAYS
+    variance = (acute_sq - acute ** 2 / ACUTE_DAYS) / (ACUTE_DAYS - 1)
+    # Rounding in the rolling sums leaves a tiny variance where every day of the window had the same load
+    deviation = np.sqrt(np.where(variance > 1e-9 * mean ** 2, variance, np.nan))
+    monotony = mean / deviation
+
+    values = {'ACWR': (acwr, None), 'Monotony': (monotony, None), 'Strain': (acute * monotony, days['unit_id'])}
+    rows = [days.assign(metric=metric, value=value, unit_id=unit_id) for metric, (value, unit_id) in values.items()]
+    rows = pd.concat(rows, ignore_index=True).dropna(subset=['value'])
+    return rows.assign(date=rows['date'].dt.date)[COLUMNS]
+
+
+def analytics_rows(sets: pd.DataFrame, reference: ReferenceData,
+                   first_dates: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Every analytics row of the sets, which need the user_id and exercise of each set."""
+    return pd.concat([set_analytics(sets), day_analytics(daily_loads(sets, reference), first_dates)],
+                     ignore_index=True)
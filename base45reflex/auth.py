@@ -0,0 +1,86 @@
+"""The Firebase auth client, the development user and a cache of verified refresh tokens.
+
+Nothing here runs when the module is imported, so processes that only need the models, like calculate_metrics, do not
+import pyrebase, read the Firebase config or open a database session on start.
+
+A refresh token Firebase accepted is remembered with its user row for TOKEN_TTL seconds, so check_login on every page
+load does not go back to Firebase and the database. revoke() and revoke_user() forget tokens before they expire.
+"""
+import functools
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import sqlmodel as sqlm
+
+from base45reflex.SQLModels import User
+
+CONFIG_PATH = "base45reflex/firebaseConfig.json"
+
+DEV_USER_ID = 'XZtDPyiyebWPhCAXYJ8BKuaBJWg2'
+
+TOKEN_TTL = 300
+MAX_TOKENS = 4096
+
+# digest of the refresh token -> (expires, user row)
+_verified: OrderedDict = OrderedDict()
+
+
+@functools.lru_cache(maxsize=None)
+def get_auth():
+    """The process's Firebase auth client, created on the first call."""
+    import pyrebase as pb
+
+    with open(CONFIG_PATH, 'r') as config_file:
+        config_data = json.load(config_file)
+    return pb.initialize_app(config_data).auth()
+
+
+def dev_user(session: sqlm.Session) -> Optional[dict]:
+    """The user every session is logged in as in DEV."""
+    user = session.exec(User.select.where(User.id == DEV_USER_ID)).first()
+    if user is None:
+        return None
+    user = user.dict()
+    user['date_of_birth'] = user['date_of_birth'].isoformat()
+    return user
+
+
+def verified_user(refresh_token: str) -> Optional[dict]:
+    """The user row of a refresh token verified in the last TOKEN_TTL seconds, None if it has to be verified."""
+    key = _digest(refresh_token)
+    entry = _verified.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        del _verified[key]
+        return None
+    _verified.move_to_end(key)
+    return entry[1]
+
+
+def remember(refresh_token: str, user: dict):
+    """Keep the user row of a refresh token Firebase just accepted, dropping the least recently used past MAX_TOKENS."""
+    key = _digest(refresh_token)
+    _verified[key] = (time.monotonic() + TOKEN_TTL, user)
+    _verified.move_to_end(key)
+    while len(_verified) > MAX_TOKENS:
+        _verified.popitem(last=False)
+
+
+def revoke(refresh_token: str):
+    """Forget a refresh token, so it is verified with Firebase again the next time it is used."""
+    _verified.pop(_digest(refresh_token), None)
+
+
+def revoke_user(user_id: str):
+    """Forget every refresh token of the user."""
+    for key in [key for key, (_, user) in _verified.items() if user['id'] == user_id]:
+        del _verified[key]
+
+
+def _digest(refresh_token: str) -> str:
+    # Only digests of the tokens are kept in memory
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
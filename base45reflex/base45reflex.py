@@ -1,5 +1,7 @@
 """Welcome to Reflex! This file outlines the steps to create a basic app."""
 
+from . import deltas
+from .deltas import DeltaMiddleware
 from .pages import exercise, index, login, program, trainer, workout
 from .state import State
 import reflex as rx
@@ -13,11 +15,15 @@ if not ENVIRONMENT == "DEV":
     app = rx.App(state=State, stylesheets=[
         "https://cdnjs.cloudflare.com/ajax/libs/animate.css/4.1.1/animate.min.css",
     ])
+    app.add_middleware(DeltaMiddleware(), index=0)
     app.add_page(index.index, route='/', on_load=State.check_login())
     app.add_page(login.login)
     app.add_page(workout.record_workout, route='/record', on_load=State.check_login())
-    app.add_page(workout.view_workout, route='/workout/[pid]', on_load=State.check_login())
+    app.add_page(workout.view_workout, route='/workout/[pid]',
+                 on_load=[State.check_login, workout.WorkoutState.load_workout])
     app.add_page(workout.update_workout, route='workout/update/[pid]', on_load=State.check_login())
+    app.add_page(workout.workout_history, route='/workouts',
+                 on_load=[State.check_login, workout.WorkoutState.load_first_pages])
     app.add_page(exercise.exercise_list, route='/exercises', on_load=State.check_login())
     app.compile()
 
@@ -25,11 +31,16 @@ else:
     app = rx.App(state=State, stylesheets=[
         "styles.css",
     ],)
-    app.add_page(index.landing, route='/')
+    app.add_middleware(DeltaMiddleware(), index=0)
+    app.api.add_api_route('/deltas', deltas.report)
+    app.add_page(index.landing, route='/', on_load=[State.load_dev_user, index.LandingState.load_first_day])
     app.add_page(login.login)
-    app.add_page(workout.record_workout, route='/record')
-    app.add_page(workout.view_workout, route='/workout/[pid]')
-    app.add_page(workout.update_workout, route='workout/update/[pid]')
-    app.add_page(exercise.exercise_list, route='/exercises')
-    app.add_page(exercise.create_exercise, route='/exercises/create')
+    app.add_page(workout.record_workout, route='/record', on_load=State.load_dev_user)
+    app.add_page(workout.view_workout, route='/workout/[pid]',
+                 on_load=[State.load_dev_user, workout.WorkoutState.load_workout])
+    app.add_page(workout.update_workout, route='workout/update/[pid]', on_load=State.load_dev_user)
+    app.add_page(workout.workout_history, route='/workouts',
+                 on_load=[State.load_dev_user, workout.WorkoutState.load_first_pages])
+    app.add_page(exercise.exercise_list, route='/exercises', on_load=State.load_dev_user)
+    app.add_page(exercise.create_exercise, route='/exercises/create', on_load=State.load_dev_user)
     app.compile()
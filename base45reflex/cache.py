@@ -0,0 +1,44 @@
+"""Process wide cache for computed vars that query the database.
+
+Reflex recomputes every @rx.var on every event, so a var that opens a session runs its queries each time any client
+does anything. Wrapping the var's function with cached_query keeps the result for the user until it expires or a write
+invalidates it.
+"""
+import functools
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+MAX_ENTRIES = 4096
+
+_entries: OrderedDict = OrderedDict()
+
+
+def cached_query(namespace: str, per_user: bool = True, ttl: float = 60) -> Callable:
+    """Cache the wrapped computed var under the namespace, per user unless per_user is False."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self):
+            user_id = self.user['id'] if per_user and self.user else None
+            key = (namespace, user_id)
+            entry = _entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                _entries.move_to_end(key)
+                return entry[1]
+            value = fn(self)
+            _entries[key] = (time.monotonic() + ttl, value)
+            _entries.move_to_end(key)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(namespace: str, user_id: Optional[Hashable] = None):
+    """Drop the cached values of the namespace, for one user or for everyone when no user is given."""
+    for key in [key for key in _entries if key[0] == namespace and (user_id is None or key[1] == user_id)]:
+        del _entries[key]
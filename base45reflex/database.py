@@ -0,0 +1,118 @@
+"""One pooled, tuned engine per process, for SQLite or Postgres.
+
+rx.session() builds a new engine, and with it a new connection, every time it is called. session() here shares one
+engine per process, created with the settings in DB_PROFILE. SQLite connections are switched to WAL so the app's reads
+are not blocked while calculate_metrics writes, with synchronous=NORMAL, a busy timeout and memory mapped reads.
+
+Event handlers use async_session() instead, so a slow query only holds up the user that is waiting for it. It runs on
+the async driver of the database, aiosqlite, or asyncpg from the postgres extra.
+"""
+import os
+from typing import Iterable, Optional
+
+import sqlmodel as sqlm
+from sqlalchemy import Table, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine as create_sqlalchemy_async_engine
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from rxconfig import DB_PROFILE, config
+
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_pid: Optional[int] = None
+
+
+def create_engine(url: str, profile: dict = DB_PROFILE) -> Engine:
+    """An engine for the url with the profile's pool, and for SQLite the profile's pragmas on every connection."""
+    if not url.startswith('sqlite'):
+        return sqlm.create_engine(url, echo=_echo(), pool_pre_ping=True, **_pool(profile))
+    # SQLAlchemy 1.4 gives file databases a NullPool, which opens a connection per session
+    engine = sqlm.create_engine(url, echo=_echo(), poolclass=QueuePool, connect_args={'check_same_thread': False},
+                                **_pool(profile))
+    _set_pragmas(engine, profile)
+    return engine
+
+
+def create_async_engine(url: str, profile: dict = DB_PROFILE) -> AsyncEngine:
+    """Like create_engine, on the async driver of the url's database."""
+    backend, rest = url.split('://', 1)
+    url = f"{ASYNC_DRIVERS[backend.split('+')[0]]}://{rest}"
+    if not url.startswith('sqlite'):
+        return create_sqlalchemy_async_engine(url, echo=_echo(), pool_pre_ping=True, **_pool(profile))
+    # aiosqlite runs every connection on its own thread, a pool would keep those threads, and the process, alive
+    engine = create_sqlalchemy_async_engine(url, echo=_echo(), poolclass=NullPool)
+    _set_pragmas(engine.sync_engine, profile)
+    return engine
+
+
+def _pool(profile: dict) -> dict:
+    return {'pool_size': profile['pool_size'], 'max_overflow': profile['max_overflow'],
+            'pool_recycle': profile['pool_recycle']}
+
+
+def _echo() -> bool:
+    return os.environ.get("SQLALCHEMY_ECHO") == "True"
+
+
+def _set_pragmas(engine: Engine, profile: dict):
+    pragmas = [f'PRAGMA {name}={profile[name]}' for name in SQLITE_PRAGMAS if profile.get(name) is not None]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(connection, _):
+        cursor = connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def get_engine() -> Engine:
+    """The process's engine for the configured database, a forked process gets its own instead of sharing the pool."""
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        _engine, _engine_pid = create_engine(config.db_url), os.getpid()
+    return _engine
+
+
+def session() -> sqlm.Session:
+    """A session on the process's engine, used like rx.session()."""
+    return sqlm.Session(get_engine())
+
+
+def get_async_engine() -> AsyncEngine:
+    """The process's async engine for the configured database."""
+    global _async_engine, _async_engine_pid
+    if _async_engine is None or _async_engine_pid != os.getpid():
+        _async_engine, _async_engine_pid = create_async_engine(config.db_url), os.getpid()
+    return _async_engine
+
+
+def async_session() -> AsyncSession:
+    """An async session on the process's async engine, for event handlers.
+
+    Query helpers written for a sync session run on it with await session.run_sync(helper, *args).
+    """
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+def upsert(bind: Engine, table: Table, index_elements: Iterable[str], columns: Iterable[str]):
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE SET columns, in the dialect of the bind's database."""
+    statement = _dialect(bind).insert(table)
+    return statement.on_conflict_do_update(index_elements=list(index_elements),
+                                           set_={column: statement.excluded[column] for column in columns})
+
+
+def insert_new(bind: Engine, table: Table):
+    """INSERT ... ON CONFLICT DO NOTHING, in the dialect of the bind's database."""
+    return _dialect(bind).insert(table).on_conflict_do_nothing()
+
+
+def _dialect(bind: Engine):
+    return postgresql if bind.dialect.name == 'postgresql' else sqlite
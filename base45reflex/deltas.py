@@ -0,0 +1,72 @@
+"""Leave unchanged vars out of state deltas and measure what the deltas that are sent cost.
+
+Reflex puts every computed var into every delta, whether its value changed or not. With SLIM_DELTAS on, the middleware
+remembers a digest of the last value each client was sent for every var and drops the vars whose value is the same.
+With MEASURE_DELTAS on, the size of every var that is sent is added up per var and logged per event, and in DEV the
+totals are served as JSON at /deltas.
+"""
+import hashlib
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from reflex.event import Event, get_hydrate_event
+from reflex.middleware import Middleware
+from reflex.state import State, StateUpdate
+from reflex.utils import console
+
+from rxconfig import MEASURE_DELTAS, SLIM_DELTAS
+
+# var -> [number of deltas it was sent in, total bytes sent]
+_sent_bytes: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+
+class DeltaMiddleware(Middleware):
+    """Slim and measure the delta of every event. Has to run before the hydrate middleware."""
+
+    def preprocess(self, app, state: State, event: Event) -> Optional[StateUpdate]:
+        # Hydrating sends the full state, anything remembered from before can no longer be relied on
+        if event.name == get_hydrate_event(state):
+            state._sent_digests = {}
+        return None
+
+    def postprocess(self, app, state: State, event: Event, update: StateUpdate) -> StateUpdate:
+        if SLIM_DELTAS:
+            slim(update.delta, state._sent_digests)
+        if MEASURE_DELTAS:
+            measure(event.name, update.delta)
+        return update
+
+
+def slim(delta: dict, sent: Dict[str, Dict[str, str]]):
+    """Drop the vars whose value is the one this client was last sent, and remember the ones that are left."""
+    for state_name, subdelta in list(delta.items()):
+        sent_state = sent.setdefault(state_name, {})
+        for var, value in list(subdelta.items()):
+            digest = hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode(),
+                                     digest_size=8).hexdigest()
+            if sent_state.get(var) == digest:
+                del subdelta[var]
+            else:
+                sent_state[var] = digest
+        if not subdelta:
+            del delta[state_name]
+
+
+def measure(event_name: str, delta: dict):
+    """Add the size of every var in the delta to the totals and log the size of the event's delta."""
+    sizes = {}
+    for state_name, subdelta in delta.items():
+        for var, value in subdelta.items():
+            sizes[f'{state_name}.{var}'] = len(json.dumps(value, default=str))
+    for var, size in sizes.items():
+        _sent_bytes[var][0] += 1
+        _sent_bytes[var][1] += size
+    largest = sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:3]
+    console.info(f"{event_name} delta {sum(sizes.values())} bytes, largest {largest}")
+
+
+def report() -> List[Tuple[str, int, int]]:
+    """(var, deltas sent in, total bytes) for every var that was sent, largest total first."""
+    return sorted(((var, count, size) for var, (count, size) in _sent_bytes.items()), key=lambda row: row[2],
+                  reverse=True)
@@ -0,0 +1,42 @@
+"""The exercise_rep_range_stats table, how often every exercise is programmed at every rep range.
+
+The table is refreshed by the refresh_exercise_stats.py job, never on a read. The refresh upserts every (exercise,
+rep range) of program_sets with a single INSERT ... SELECT ... GROUP BY and deletes the ranges no program has any more,
+so edited rep ranges are picked up and overlapping refreshes do not collide on the unique index.
+"""
+from typing import List
+
+import sqlmodel as sqlm
+from sqlalchemy import Numeric, cast, delete, func, true, tuple_
+
+from base45reflex import database
+from base45reflex.SQLModels import ExerciseRepRangeStats, Program, ProgramSet
+
+RANGE_KEYS = ('exercise_id', 'min_reps', 'max_reps')
+
+
+def refresh(session: sqlm.Session) -> int:
+    """Bring the table in line with program_sets in one transaction, returns the number of rep ranges."""
+    program_count = sqlm.select(func.count(Program.id)).scalar_subquery()
+    count = func.count(ProgramSet.id)
+    grouped = (sqlm.select(ProgramSet.exercise_id, ProgramSet.min_reps, ProgramSet.max_reps, count,
+                           func.round(cast(count * 100.0 / program_count, Numeric), 2))
+               # SQLite needs a WHERE clause to tell the upsert's ON CONFLICT from a join constraint
+               .where(true())
+               .group_by(ProgramSet.exercise_id, ProgramSet.min_reps, ProgramSet.max_reps))
+    statement = database.upsert(session.get_bind(), ExerciseRepRangeStats.__table__, RANGE_KEYS, ('count', 'percent'))
+    session.execute(statement.from_select([*RANGE_KEYS, 'count', 'percent'], grouped))
+    programmed = sqlm.select(ProgramSet.exercise_id, ProgramSet.min_reps, ProgramSet.max_reps)
+    session.execute(delete(ExerciseRepRangeStats)
+                    .where(tuple_(ExerciseRepRangeStats.exercise_id, ExerciseRepRangeStats.min_reps,
+                                  ExerciseRepRangeStats.max_reps).not_in(programmed))
+                    .execution_options(synchronize_session=False))
+    session.commit()
+    return session.execute(sqlm.select(func.count(ExerciseRepRangeStats.id))).scalar_one()
+
+
+def rep_range_stats(session: sqlm.Session) -> List[ExerciseRepRangeStats]:
+    """Every row of the table, grouped by exercise and most popular rep range first."""
+    statement = (sqlm.select(ExerciseRepRangeStats)
+                 .order_by(ExerciseRepRangeStats.exercise_id, ExerciseRepRangeStats.count.desc()))
+    return session.exec(statement).all()
@@ -0,0 +1,85 @@
+"""Landing page indicator payloads and the front end template they are drawn with.
+
+A payload only carries the numbers for one exercise of one program day, the plotly traces are assembled from them in
+the browser so the state delta stays a few bytes per exercise.
+"""
+import math
+from typing import Dict, Iterable, Optional
+
+import plotly.graph_objects as go
+from reflex.utils import format
+from reflex.vars import BaseVar, Var
+
+METRICS = ('TotalLoad', 'AvgRPE', 'AvgRepsPerSet')
+
+# (title, metric, statistic, grid row, grid column, number suffix)
+INDICATORS = (
+    ("Total Load", 'TotalLoad', 'value', 0, 0, 'unit'),
+    ("Total Load Variance", 'TotalLoad', 'var', 1, 0, None),
+    ("Avg RPE", 'AvgRPE', 'value', 0, 1, None),
+    ("Avg RPE Variance", 'AvgRPE', 'var', 1, 1, None),
+    ("Reps Per Set", 'AvgRepsPerSet', 'value', 0, 2, ' reps'),
+    ("Reps Per Set Variance", 'AvgRepsPerSet', 'var', 1, 2, None),
+)
+
+LAYOUT = dict(grid={'rows': 2, 'columns': 3, 'pattern': "independent"},
+              paper_bgcolor='#262626', font={'color': '#aaaaaa'})
+
+
+def summary_metrics(summary: Iterable[tuple], unit_names: Dict[int, str]) -> Dict[object, Dict[str, Dict[str, float]]]:
+    """Nest (summary row, day) pairs into day -> exercise -> metric values.
+
+    Only the exercises logged in the most recent workout of each day are kept.
+    """
+    summary = list(summary)
+    most_recent = {}
+    for row, day in summary:
+        most_recent[day] = max(most_recent.get(day, row.latest_date), row.latest_date)
+    metrics = {}
+    for row, day in summary:
+        if row.latest_date != most_recent[day]:
+            continue
+        ex_metrics = metrics.setdefault(day, {}).setdefault(row.exercise, {})
+        ex_metrics[row.metric] = round(row.latest, 2)
+        ex_metrics[f'{row.metric}_prev'] = round(row.prev, 2)
+        ex_metrics[f'{row.metric}_var'] = round(row.m2 / (row.count - 1), 2) if row.count > 1 else float('nan')
+        ex_metrics[f'{row.metric}_unit'] = unit_names.get(row.unit_id)
+    return metrics
+
+
+def payload(exercise: str, ex_metrics: Dict[str, float]) -> dict:
+    """The numbers the indicators of one exercise need, value, previous value and variance of every metric in order."""
+    values = []
+    for metric in METRICS:
+        for key in (metric, f'{metric}_prev', f'{metric}_var'):
+            values.append(_number(ex_metrics.get(key)))
+    return {'exercise': exercise, 'unit': ex_metrics.get('TotalLoad_unit') or '', 'values': values}
+
+
+def _number(value) -> Optional[float]:
+    if value is None or math.isnan(value):
+        return None
+    return float(value)
+
+
+def traces(indicator_payload: Var) -> Var:
+    """The plotly traces for a payload var, written as a javascript expression so they are built by the browser."""
+    name = indicator_payload.full_name
+    data = []
+    for title, metric, statistic, row, column, suffix in INDICATORS:
+        position = METRICS.index(metric) * 3
+        trace = {
+            'type': 'indicator',
+            'mode': "number+delta",
+            'value': f'{{{name}.values[{position if statistic == "value" else position + 2}]}}',
+            'domain': {'row': row, 'column': column},
+            'title': {'text': title},
+        }
+        if statistic == 'value':
+            trace['delta'] = {'reference': f'{{{name}.values[{position + 1}]}}', 'relative': True, 'position': "top"}
+            if suffix == 'unit':
+                trace['number'] = {'suffix': f'{{" " + {name}.unit}}'}
+            elif suffix:
+                trace['number'] = {'suffix': suffix}
+        data.append(trace)
+    return BaseVar(name=format.unwrap_vars(format.json_dumps(data)), type_=go.Figure, is_local=True)
@@ -44,6 +44,7 @@ class PageView:
                                 rx.vstack(
                                     rx.link(rx.button('Profile', bg='#1a472a', color='#ffffff'), href='/', button=True),
                                     rx.link(rx.button('Record Workout', bg='#1a472a', color='#ffffff'), href='/record', button=True),
+                                    rx.link(rx.button('Workout History', bg='#1a472a', color='#ffffff'), href='/workouts', button=True),
                                     rx.link(rx.button('View Current Program', bg='#1a472a', color='#ffffff'), href='/', button=True),
                                     rx.link(rx.button('Edit Current Program', bg='#1a472a', color='#ffffff'), href='/', button=True),
                                     rx.link(rx.button("Create New Program", bg='#1a472a', color='#ffffff'), href='/', button=True),
@@ -1,7 +1,9 @@
-import pandas as pd
 import reflex as rx
+from ..cache import cached_query, invalidate
 from ..page_view import PageView
-from base45reflex.SQLModels import Exercise, ProgramSet, Program, ExerciseType
+from .. import database, exercise_stats, reference
+from ..reference import get_reference
+from base45reflex.SQLModels import Exercise
 from ..state import State
 from typing import List, Dict
 
@@ -9,55 +11,35 @@ from typing import List, Dict
 class ExerciseState(State):
 
     @rx.var
+    @cached_query('exercise_types', per_user=False)
     def exercise_type_list(self) -> List[str]:
-        with rx.session() as session:
-            results = session.query(ExerciseType).all()
-        return [result.name for result in results]
+        with database.session() as session:
+            exercise_types = get_reference(session).exercise_types
+        return [exercise_types[type_id]['name'] for type_id in sorted(exercise_types)]
 
     @rx.var
+    @cached_query('exercise_cards', per_user=False)
     def exercise_cards(self) -> List[dict]:
-        with rx.session() as session:
-            exercise_list = session.query(Exercise).all()
-            results = session.query(ProgramSet).all()
-            program_count = session.query(Program).count()
+        with database.session() as session:
+            exercises = get_reference(session).exercise_names
+            bodies = {}
+            for row in exercise_stats.rep_range_stats(session):
+                bodies.setdefault(row.exercise_id, []).append([f'{row.min_reps}-{row.max_reps}', f'{row.percent}%'])
 
-        exercises = [exercise.dict() for exercise in exercise_list]
-        exercises = {exercise['id']: exercise['name'] for exercise in exercises}
-        results = [result.dict() for result in results]
-        for result in results:
-            result['exercise_name'] = exercises[result['exercise_id']]
+        return [{'header': name, 'body': bodies.get(exercise_id, 'No data')} for exercise_id, name in exercises.items()]
 
-        df = pd.DataFrame(results)
-        df = df.groupby(['exercise_name', 'min_reps', 'max_reps']).agg({'id': 'count'}).reset_index()
-        df = df.rename(columns={'id': 'count'})
-        df['rep_range'] = df['min_reps'].astype(str) + '-' + df['max_reps'].astype(str)
-        df = df.drop(columns=['min_reps', 'max_reps'])
-        df['percent'] = round((df['count'] / program_count) * 100, 2)
-        df = df.sort_values(by=['exercise_name', 'count'], ascending=False)
-        cards = []
-        for exercise in exercise_list:
-            temp = df[df['exercise_name'] == exercise.name].copy()
-            temp = temp.sort_values(by=['percent'], ascending=False)
-            if temp.empty:
-                cards.append({'header': exercise.name, 'body': 'No data'})
-                continue
-            temp['percent'] = temp['percent'].astype(str) + '%'
-            temp = temp[['rep_range', 'percent']]
-            temp = temp.values.tolist()
-            data = {'header': exercise.name,
-                    'body': temp}
-            cards.append(data)
-
-        return cards
-
-    def handle_form(self, data: dict):
-        exercise = Exercise(name=data['name'],
-                            type=self.exercise_type_list.index(data['exercise_type']) + 1,
-                            weight_step=float(data['weight_step'])
-                            )
-        with rx.session() as session:
+    async def handle_form(self, data: dict):
+        async with database.async_session() as session:
+            exercise_types = (await session.run_sync(get_reference)).exercise_types
+            type_ids = {row['name']: type_id for type_id, row in exercise_types.items()}
+            exercise = Exercise(name=data['name'],
+                                type=type_ids[data['exercise_type']],
+                                weight_step=float(data['weight_step'])
+                                )
             session.add(exercise)
-            session.commit()
+            await session.commit()
+        reference.invalidate()
+        invalidate('exercise_cards')
         return rx.redirect('/exercises')
 
 
@@ -1,16 +1,27 @@
 from datetime import date
+import json
 import reflex as rx
 import pandas as pd
+from .. import database
+from ..cache import cached_query
+from ..indicators import LAYOUT, METRICS, payload, summary_metrics, traces
 from ..page_view import PageView
-import plotly.graph_objects as go
-from base45reflex.SQLModels import UserProgramHistory, ProgramDay, Workout, WorkoutSet, UserWorkoutMetrics, Exercise
+from base45reflex.SQLModels import (UserProgramHistory, ProgramDay, UserMetricSummary, UserIndicatorPayload,
+                                    UserProgramHistoryPrediction)
+from ..queries import current_program, workout_metrics
+from ..reference import get_reference
 from ..state import State
+from ..units import convert
 import sqlmodel as sqlm
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from pprint import pprint
 
 
+# How many program days a session keeps loaded
+LOADED_DAYS = 3
+
+
 class Calendar(rx.Component):
     library = 'react-event-calendar'
     tag = 'EventCalendar'
@@ -36,142 +47,44 @@ def index() -> rx.Component:
 
 
 class LandingState(State):
+    # The indicator payloads of the days whose tab was opened, least recently opened first
+    day_indicators: Dict[str, List[dict]] = {}
 
     @rx.var
+    @cached_query('user_program')
     def user_program(self) -> List[dict]:
-        with rx.session() as session:
-            statement = UserProgramHistory.select.where(sqlm.and_(UserProgramHistory.user_id == self.user['id'],
-                                                                  UserProgramHistory.current == 1))
-            current_program = session.exec(statement).first()
-            program_days = session.query(ProgramDay).filter(ProgramDay.program_id == current_program.program_id).all()
+        if not self.user:
+            return []
+        with database.session() as session:
+            program = current_program(session, self.user['id'])
+            program_days = session.query(ProgramDay).filter(ProgramDay.program_id == program.program_id).all()
             return [day.dict() for day in program_days]
 
     @rx.var
-    def program_start_date(self) -> date:
-        with rx.session() as session:
-            statement = UserProgramHistory.select.where(sqlm.and_(UserProgramHistory.user_id == self.user['id'],
-                                                                  UserProgramHistory.current == 1))
-            current_program = session.exec(statement).first()
-            return current_program.start_date.isoformat()
-
-    @rx.var
-    def metrics(self) -> Dict[str, Dict[str, Dict[str, float]]]:
-        data = []
-        with rx.session() as session:
-            workout_stmt = Workout.select.where(sqlm.and_(
-                Workout.user_id == self.user['id'],
-                Workout.date >= self.program_start_date
-            ))
-            workout_list = session.exec(workout_stmt).all()
-
-            for workout in workout_list:
-                day_name = workout.day.name
-                sets = workout.workout_sets
-                for ex_set in sets:
-                    ex_metrics = ex_set.metrics
-                    for metric in ex_metrics:
-                        data.append({'day_name': day_name, 'exercise': metric.exercise,
-                                     'metric': metric.metric, 'value': metric.value,
-                                     'unit': 'lbs' if metric.unit_id == 1 else None, 'date': metric.date})
-        df = pd.DataFrame.from_records(data)
-        df.sort_values('date', ascending=True, inplace=True)
-        df['prev'] = df.groupby(['day_name', 'exercise', 'metric'])['value'].shift(1).fillna(0)
-        metrics = {}
-        for day_name in df['day_name'].unique():
-            metrics[day_name] = {}
-            temp = df[df['day_name'] == day_name].copy()
-            dates = temp['date'].unique()
-            dates.sort()
-            most_recent = dates[-1]
-            for exercise in temp['exercise'].unique():
-                metrics[day_name][exercise] = {}
-                ex_metrics = temp[(temp['exercise'] == exercise) & (temp['date'] == most_recent)].to_records()
-                for rec in ex_metrics:
-                    metrics[day_name][exercise][rec['metric']] = round(rec["value"], 2)
-                    metrics[day_name][exercise][f"{rec['metric']}_prev"] = round(rec['prev'], 2)
-                    var = temp[(temp['exercise'] == exercise) & (temp['metric'] == rec['metric'])].copy()
-                    metrics[day_name][exercise][f'{rec["metric"]}_var'] = round(var['value'].var(), 2)
-                    metrics[day_name][exercise][f'{rec["metric"]}_unit'] = rec['unit']
-        return metrics
-
-    @rx.var
-    def indicators(self) -> Dict[str, Dict[str, go.Figure]]:
-        data = self.metrics
-        indicators = {}
-        for day_name in data.keys():
-            ex_metrics = data[day_name]
-            indicators[day_name] = {}
-            for exercise in ex_metrics:
-                metrics = ex_metrics[exercise]
-                unit = metrics['TotalLoad_unit']
-                ref = metrics['TotalLoad_prev']
-                value = metrics['TotalLoad']
-                var = metrics['TotalLoad_var']
-                fig = go.Figure()
-                fig.add_trace(
-                    go.Indicator(
-                        mode="number+delta",
-                        value=value,
-                        number={'suffix': f" {unit}"},
-                        delta={'reference': ref, 'relative': True, 'position': "top"},
-                        domain={'row': 0, 'column': 0},
-                        title={'text': "Total Load"}
-                    )
-                )
-                fig.add_trace(
-                    go.Indicator(
-                        mode="number+delta",
-                        value=var,
-                        domain={'row': 1, 'column': 0},
-                        title={'text': "Total Load Variance"}
-                    )
-                )
-                ref = metrics['AvgRPE_prev']
-                value = metrics['AvgRPE']
-                var = metrics['AvgRPE_var']
-                fig.add_trace(
-                    go.Indicator(
-                        mode="number+delta",
-                        value=value,
-                        number={},
-                        delta={'reference': ref, 'relative': True, 'position': "top"},
-                        domain={'row': 0, 'column': 1},
-                        title={'text': "Avg RPE"}
-                    )
-                )
-                fig.add_trace(
-                    go.Indicator(
-                        mode="number+delta",
-                        value=var,
-                        domain={'row': 1, 'column': 1},
-                        title={'text': "Avg RPE Variance"}
-                    )
-                )
-                ref = metrics['AvgRepsPerSet_prev']
-                value = metrics['AvgRepsPerSet']
-                var = metrics['AvgRepsPerSet_var']
-                fig.add_trace(
-                    go.Indicator(
-                        mode="number+delta",
-                        value=value,
-                        number={'suffix': ' reps'},
-                        delta={'reference': ref, 'relative': True, 'position': "top"},
-                        domain={'row': 0, 'column': 2},
-                        title={'text': "Reps Per Set"}
-                    )
-                )
-                fig.add_trace(
-                    go.Indicator(
-                        mode="number+delta",
-                        value=var,
-                        domain={'row': 1, 'column': 2},
-                        title={'text': "Reps Per Set Variance"}
-                    )
-                )
-                fig.update_layout(title={'text': exercise})
-                indicators[day_name][exercise] = fig
-
-        return indicators
+    @cached_query('program_start_date')
+    def program_start_date(self) -> str:
+        if not self.user:
+            return ''
+        with database.session() as session:
+            return current_program(session, self.user['id']).start_date.isoformat()
+
+    async def load_day(self, day_name: str):
+        """Load the indicators of a program day when its tab is selected, keeping the most recently opened days."""
+        loaded = dict(self.day_indicators)
+        indicators = loaded.pop(day_name, None)
+        if indicators is None:
+            program_day = next(day for day in self.user_program if day['name'] == day_name)
+            async with database.async_session() as session:
+                indicators = await session.run_sync(day_indicators, self.user['id'], program_day['id'],
+                                                    date.fromisoformat(self.program_start_date))
+        loaded[day_name] = indicators
+        while len(loaded) > LOADED_DAYS:
+            loaded.pop(next(iter(loaded)))
+        self.day_indicators = loaded
+
+    def load_first_day(self):
+        if self.day_names:
+            return LandingState.load_day(self.day_names[0])
 
     @rx.var
     def day_names(self) -> List[str]:
@@ -181,7 +94,87 @@ class LandingState(State):
 
     @rx.var
     def first_name(self):
-        return self.user['first_name']
+        return self.user['first_name'] if self.user else ''
+
+
+def day_indicators(session: sqlm.Session, user_id: str, program_day_id: int, start_date: date) -> List[dict]:
+    """The indicator payloads of one program day, rendered from its summary or history if the job has not run yet.
+
+    Each payload carries the exercise's end of block projection, empty if project_programs has not projected it.
+    """
+    statement = (sqlm.select(UserIndicatorPayload.payload)
+                 .join(UserProgramHistory, UserProgramHistory.id == UserIndicatorPayload.user_program_history_id)
+                 .where(UserIndicatorPayload.user_id == user_id)
+                 .where(UserProgramHistory.current == True)
+                 .where(UserIndicatorPayload.program_day_id == program_day_id)
+                 .order_by(UserIndicatorPayload.exercise))
+    rows = session.exec(statement).all()
+    if rows:
+        payloads = [json.loads(row) for row in rows]
+    else:
+        statement = (UserMetricSummary.select
+                     .join(UserProgramHistory, UserProgramHistory.id == UserMetricSummary.user_program_history_id)
+                     .where(UserMetricSummary.user_id == user_id)
+                     .where(UserProgramHistory.current == True)
+                     .where(UserMetricSummary.program_day_id == program_day_id))
+        summary = session.exec(statement).all()
+        if summary:
+            metrics = summary_metrics(((row, program_day_id) for row in summary), get_reference(session).unit_names)
+        else:
+            metrics = history_metrics(session, user_id, start_date, program_day_id)
+        day_metrics = next(iter(metrics.values()), {})
+        payloads = [payload(exercise, ex_metrics) for exercise, ex_metrics in sorted(day_metrics.items())]
+    projections = day_projections(session, user_id, program_day_id)
+    for indicator_payload in payloads:
+        indicator_payload['projection'] = projections.get(indicator_payload['exercise'], '')
+    return payloads
+
+
+def day_projections(session: sqlm.Session, user_id: str, program_day_id: int) -> Dict[str, str]:
+    """The end of block projection of every exercise of the program day in the user's current program, formatted."""
+    statement = (sqlm.select(UserProgramHistoryPrediction.exercise_id, UserProgramHistoryPrediction.unit_id,
+                             UserProgramHistoryPrediction.value)
+                 .join(UserProgramHistory,
+                       UserProgramHistory.id == UserProgramHistoryPrediction.user_program_history_id)
+                 .where(UserProgramHistory.user_id == user_id)
+                 .where(UserProgramHistory.current == True)
+                 .where(UserProgramHistoryPrediction.program_day_id == program_day_id))
+    reference = get_reference(session)
+    return {reference.exercise_names.get(exercise_id): f"{value:g} {reference.unit_names.get(unit_id, '')}".strip()
+            for exercise_id, unit_id, value in session.exec(statement).all()}
+
+
+def history_metrics(session: sqlm.Session, user_id: str, start_date: date,
+                    program_day_id: Optional[int] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Build the landing page metrics from every metric logged since the program started, optionally for one day.
+
+    Each group is reported in the unit of its most recent record.
+    """
+    rows = workout_metrics(session, user_id, start_date, program_day_id=program_day_id, metrics=METRICS)
+    if not rows:
+        return {}
+    reference = get_reference(session)
+    keys = ['day_name', 'exercise', 'metric']
+    df = pd.DataFrame(rows, columns=['day_name', 'exercise', 'metric', 'value', 'unit_id', 'date'])
+    df = df.sort_values('date', kind='stable')
+    df['target_unit'] = df.groupby(keys)['unit_id'].transform('last')
+    df['value'] = convert(df['value'], df['unit_id'], df['target_unit'], reference)
+    df['unit'] = df['target_unit'].map(reference.unit_names)
+    df['unit'] = df['unit'].where(df['unit'].notna(), None)
+    df['prev'] = df.groupby(keys)['value'].shift(1).fillna(0)
+    variance = df.groupby(keys)['value'].var().rename('var')
+    # The last record of each group on the day's most recent workout date
+    latest = df[df['date'] == df.groupby('day_name')['date'].transform('max')]
+    latest = latest.drop_duplicates(keys, keep='last').set_index(keys).join(variance)
+
+    metrics = {}
+    for (day_name, exercise, metric), rec in latest.iterrows():
+        ex_metrics = metrics.setdefault(day_name, {}).setdefault(exercise, {})
+        ex_metrics[metric] = round(rec['value'], 2)
+        ex_metrics[f'{metric}_prev'] = round(rec['prev'], 2)
+        ex_metrics[f'{metric}_var'] = round(rec['var'], 2)
+        ex_metrics[f'{metric}_unit'] = rec['unit']
+    return metrics
 
 
 def landing() -> rx.Component:
@@ -210,20 +203,26 @@ def landing() -> rx.Component:
 
 
 def build_tab_list(day_name: str):
-    return rx.tab(day_name)
+    return rx.tab(day_name, on_click=LandingState.load_day(day_name))
 
 
 def build_metric_block(day_name: str):
-    figs = LandingState.indicators[day_name]
+    figs = LandingState.day_indicators[day_name]
     return rx.tab_panel(
-        rx.foreach(
-            figs,
-            lambda x: rx.vstack(
-                rx.text(x[0], font_size='1.5em', color='#aaaaaa'),
-                rx.plotly(data=x[1], layout=dict(grid={'rows': 2, 'columns': 3, 'pattern': "independent"},
-                                                 paper_bgcolor='#262626', font={'color': '#aaaaaa'},
-                                                 )
-                          ))
+        rx.cond(
+            LandingState.day_indicators.contains(day_name),
+            rx.foreach(
+                figs,
+                lambda x: rx.vstack(
+                    rx.text(x['exercise'], font_size='1.5em', color='#aaaaaa'),
+                    rx.plotly(data=traces(x), layout=LAYOUT),
+                    rx.cond(
+                        x['projection'],
+                        rx.text("Projected total load at end of block: ", x['projection'], color='#aaaaaa'),
+                    )
+                )
+            ),
+            rx.center(rx.spinner(color='#aaaaaa'))
         ),
 
         width='100%'
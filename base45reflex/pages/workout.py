@@ -1,51 +1,73 @@
 import reflex as rx
-from ..SQLModels import Workout, WorkoutSet, WorkoutComment, UserClients, UserProgramHistory, ProgramDay
+from datetime import date
+from .. import database, queries
+from ..SQLModels import Workout, WorkoutSet, WorkoutComment, UserProgramHistory, ProgramDay
+from ..reference import get_reference
 from ..state import State
 from ..page_view import PageView
 from typing import List
+import sqlmodel as sqlm
 
 
 class WorkoutState(State):
+    history: List[dict] = []
+    history_complete: bool = False
+    client_history: List[dict] = []
+    client_history_complete: bool = False
+    # The workout in the url and its sets, empty until they are loaded or when the user may not view them
+    workout: dict = {}
+    workout_sets: List[dict] = []
 
     @rx.var
     def verify(self) -> bool:
         if not self.user:
             return False
-        workout_list = [workout['id'] for workout in self.data]
-        client_workouts = [workout['id'] for workout in self.client_data]
         workout_id = self.get_query_params().get("pid", "no pid")
         if workout_id == "no pid":
             return False
         else:
             workout_id = int(workout_id)
-            return workout_id in workout_list or id in client_workouts
-
-    @rx.var
-    def data(self) -> List[dict]:
-        if not self.user:
-            return []
-        with rx.session() as session:
-            data = session.query(Workout).filter(Workout.user_id == self.user['id']).all()
-            data = self.parse_data(data)
-        return data
-
-    @rx.var
-    def client_data(self) -> List[dict]:
-        if not self.user:
-            return []
-        with rx.session() as session:
-            client_list = session.query(UserClients).filter(UserClients.user_id == self.user['id']).all()
-            for client in client_list:
-                client_workouts = session.query(Workout).filter(Workout.user_id == client.id)
-                client_workouts = self.parse_data(data=client_workouts)
-            return client_workouts
-
-    @staticmethod
-    def parse_data(self, data: List[Workout]):
-        data = [workout.dict() for workout in data]
-        for workout in data:
-            workout['date'] = workout['date'].isoformat()
-        return data
+            with database.session() as session:
+                return queries.can_view_workout(session, self.user['id'], workout_id)
+
+    def load_first_pages(self):
+        """Start the user's and their clients' histories over from the newest workouts."""
+        self.history, self.history_complete = [], False
+        self.client_history, self.client_history_complete = [], False
+        return [WorkoutState.load_history, WorkoutState.load_client_history]
+
+    async def load_history(self):
+        """Append the next page of the user's workouts to history."""
+        if not self.user or self.history_complete:
+            return
+        after = None
+        if self.history:
+            after = (date.fromisoformat(self.history[-1]['date']), self.history[-1]['id'])
+        async with database.async_session() as session:
+            page = await session.run_sync(queries.workout_history_page, self.user['id'], after)
+            self.history += parse_data(page)
+        self.history_complete = len(page) < queries.HISTORY_PAGE_SIZE
+
+    async def load_workout(self):
+        """Load the workout in the url with its sets and their metrics."""
+        self.workout, self.workout_sets = {}, []
+        if self.verify:
+            async with database.async_session() as session:
+                workout = await session.run_sync(workout_details, int(self.workout_id))
+            self.workout_sets = workout.pop('sets', [])
+            self.workout = workout
+
+    async def load_client_history(self):
+        """Append the next page of the workouts of the user's clients to client_history."""
+        if not self.user or self.client_history_complete:
+            return
+        after = None
+        if self.client_history:
+            after = (date.fromisoformat(self.client_history[-1]['date']), self.client_history[-1]['id'])
+        async with database.async_session() as session:
+            page = await session.run_sync(queries.client_workouts_page, self.user['id'], after)
+            self.client_history += parse_data(page)
+        self.client_history_complete = len(page) < queries.HISTORY_PAGE_SIZE
 
     @rx.var
     def workout_id(self):
@@ -68,6 +90,36 @@ class WorkoutFormState(WorkoutState):
         self.items = [i for i in self.items if i is not item]
 
 
+def parse_data(data: List[Workout]) -> List[dict]:
+    """The workouts as state rows, kept out of WorkoutState where Reflex would turn it into an event handler."""
+    data = [workout.dict() for workout in data]
+    for workout in data:
+        workout['date'] = workout['date'].isoformat()
+    return data
+
+
+def workout_details(session: sqlm.Session, workout_id: int) -> dict:
+    """The workout with its program day and its sets, each with its metrics, in four statements."""
+    found = session.exec(sqlm.select(Workout.user_id, Workout.date).where(Workout.id == workout_id)).first()
+    if found is None:
+        return {}
+    user_id, day = found
+    workout = next(workout for workout in queries.workouts_with_sets(session, user_id, day, day)
+                   if workout.id == workout_id)
+    reference = get_reference(session)
+    return {
+        'id': workout.id,
+        'date': workout.date.isoformat(),
+        'day': workout.day.name if workout.day else '',
+        'sets': [{'exercise': reference.exercise_names.get(workout_set.exercise_id, ''),
+                  'description': f"{workout_set.num_sets} x {workout_set.reps // workout_set.num_sets} @ "
+                                 f"{workout_set.weight:g} {reference.unit_names.get(workout_set.unit_id, '')} "
+                                 f"RPE {workout_set.avg_rpe:g}",
+                  'metrics': ', '.join(f"{metric.metric} {metric.value:.2f}" for metric in workout_set.metrics)}
+                 for workout_set in sorted(workout.workout_sets, key=lambda workout_set: workout_set.set_order)],
+    }
+
+
 def record_workout():
     return PageView([
         rx.heading("Record Workout"),
@@ -78,7 +130,40 @@ def record_workout():
 
 
 def view_workout():
-    return PageView([rx.cond(WorkoutState.verify, rx.text(WorkoutState.workout_id), rx.text('DUMB ASS'))]).build()
+    return PageView([rx.cond(
+        WorkoutState.workout.contains('id'),
+        rx.vstack(
+            rx.heading(WorkoutState.workout['date'], " ", WorkoutState.workout['day']),
+            rx.foreach(WorkoutState.workout_sets, lambda x: rx.vstack(
+                rx.text(x['exercise'], font_size='1.25em'),
+                rx.text(x['description']),
+                rx.text(x['metrics'], color='#aaaaaa'),
+            )),
+        ),
+        rx.cond(WorkoutState.verify, rx.spinner(color='#aaaaaa'), rx.text('DUMB ASS')),
+    )]).build()
+
+
+def history_list(history, complete, load_more):
+    return rx.vstack(
+        rx.foreach(history, lambda x: rx.link(x['date'], href=f"/workout/{x['id']}", color='#aaaaaa')),
+        rx.cond(complete, rx.fragment(), rx.button('Load more', on_click=load_more, bg='#1a472a', color='#ffffff')),
+    )
+
+
+def workout_history():
+    return PageView([
+        rx.heading("Workout History", color='#aaaaaa'),
+        history_list(WorkoutState.history, WorkoutState.history_complete, WorkoutState.load_history),
+        rx.cond(
+            WorkoutState.client_history,
+            rx.vstack(
+                rx.heading("Client Workouts", color='#aaaaaa'),
+                history_list(WorkoutState.client_history, WorkoutState.client_history_complete,
+                             WorkoutState.load_client_history),
+            ),
+        ),
+    ]).build()
 
 
 def update_workout():
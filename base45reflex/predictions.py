@@ -0,0 +1,23 @@
+"""Estimated one rep max and the loads it predicts, vectorized over NumPy arrays or pandas Series.
+
+The estimate is Epley's formula with the reps left in reserve counted as reps, so a set of 5 at RPE 8 is treated like
+a set of 7 to failure: e1RM = weight * (1 + (reps + 10 - rpe) / 30).
+"""
+import numpy as np
+
+
+def estimate_1rm(weight, reps, rpe):
+    """The one rep max a set of reps at the weight and RPE estimates."""
+    return weight * (1 + (reps + 10 - np.asarray(rpe, dtype=float)) / 30)
+
+
+def weight_for_reps(e1rm, reps, rpe):
+    """The weight that makes the reps land on the RPE for a lifter with the one rep max."""
+    return e1rm / (1 + (reps + 10 - np.asarray(rpe, dtype=float)) / 30)
+
+
+def round_to_step(weight, step):
+    """The weight rounded to the nearest multiple of the step, unchanged where there is no step."""
+    step = np.asarray(step, dtype=float)
+    usable = np.isfinite(step) & (step > 0)
+    return np.where(usable, np.round(weight / np.where(usable, step, 1)) * np.where(usable, step, 1), weight)
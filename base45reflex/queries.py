@@ -0,0 +1,104 @@
+"""Query helpers that load whole object graphs up front instead of lazy loading them inside loops."""
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+import sqlmodel as sqlm
+from sqlalchemy import exists, tuple_
+from sqlalchemy.orm import joinedload, subqueryload
+
+from base45reflex.SQLModels import ProgramDay, UserClients, UserProgramHistory, UserWorkoutMetrics, Workout, WorkoutSet
+
+
+def current_program(session: sqlm.Session, user_id: str) -> Optional[UserProgramHistory]:
+    statement = UserProgramHistory.select.where(sqlm.and_(UserProgramHistory.user_id == user_id,
+                                                          UserProgramHistory.current == True))
+    return session.exec(statement).first()
+
+
+HISTORY_PAGE_SIZE = 50
+
+
+def can_view_workout(session: sqlm.Session, user_id: str, workout_id: int) -> bool:
+    """Whether the workout is the user's own or one of their clients', in one statement however many clients they have."""
+    clients = sqlm.select(UserClients.client_id).where(UserClients.user_id == user_id)
+    statement = sqlm.select(exists().where(sqlm.and_(Workout.id == workout_id,
+                                                     sqlm.or_(Workout.user_id == user_id,
+                                                              Workout.user_id.in_(clients)))))
+    return session.exec(statement).one()
+
+
+def client_workouts_page(session: sqlm.Session, user_id: str, after: Optional[Tuple[date, int]] = None,
+                         limit: int = HISTORY_PAGE_SIZE) -> List[Workout]:
+    """One page of the workouts of all of the user's clients, newest first, after the (date, id) of the previous page.
+
+    One statement however many clients the user has. Each client's workouts before the cursor are a range of the
+    (user_id, date, id) index, but they are merged and sorted in full for every page, so a page costs time in
+    proportion to the clients' history before the cursor rather than to the page size.
+    """
+    clients = sqlm.select(UserClients.client_id).where(UserClients.user_id == user_id)
+    statement = (sqlm.select(Workout)
+                 .where(Workout.user_id.in_(clients))
+                 .order_by(Workout.date.desc(), Workout.id.desc())
+                 .limit(limit))
+    if after is not None:
+        statement = statement.where(tuple_(Workout.date, Workout.id) < tuple_(*after))
+    return session.exec(statement).all()
+
+
+def workout_history_page(session: sqlm.Session, user_id: str, after: Optional[Tuple[date, int]] = None,
+                         limit: int = HISTORY_PAGE_SIZE) -> List[Workout]:
+    """One page of the user's workouts, newest first, starting after the (date, id) of the previous page's last one.
+
+    The page is a range of the (user_id, date, id) index, so it costs the same however deep into the history it is.
+    """
+    statement = (sqlm.select(Workout)
+                 .where(Workout.user_id == user_id)
+                 .order_by(Workout.date.desc(), Workout.id.desc())
+                 .limit(limit))
+    if after is not None:
+        statement = statement.where(tuple_(Workout.date, Workout.id) < tuple_(*after))
+    return session.exec(statement).all()
+
+
+def workouts_with_sets(session: sqlm.Session, user_id: str, start: Optional[date] = None,
+                       end: Optional[date] = None) -> List[Workout]:
+    """Workouts of the user between the dates with their day, sets and the sets' metrics loaded.
+
+    Always runs three statements, one for the workouts and their day, one for the sets and one for the metrics. The
+    sets and metrics are loaded with the workout query as a subquery rather than IN lists of ids, which SQLAlchemy
+    splits into a statement per 500 parents.
+    """
+    statement = (sqlm.select(Workout)
+                 .where(Workout.user_id == user_id)
+                 .options(joinedload(Workout.day),
+                          subqueryload(Workout.workout_sets).subqueryload(WorkoutSet.metrics))
+                 .order_by(Workout.date))
+    if start is not None:
+        statement = statement.where(Workout.date >= start)
+    if end is not None:
+        statement = statement.where(Workout.date <= end)
+    return session.exec(statement).all()
+
+
+def workout_metrics(session: sqlm.Session, user_id: str, start: Optional[date] = None, end: Optional[date] = None,
+                    program_day_id: Optional[int] = None, metrics: Optional[Sequence[str]] = None) -> List[tuple]:
+    """The user's metrics between the dates with the name of the program day they were logged on, in one statement.
+
+    Only the metric kinds in metrics are read when it is given.
+    """
+    statement = (sqlm.select(ProgramDay.name.label('day_name'), UserWorkoutMetrics.exercise, UserWorkoutMetrics.metric,
+                             UserWorkoutMetrics.value, UserWorkoutMetrics.unit_id, UserWorkoutMetrics.date)
+                 .join(WorkoutSet, UserWorkoutMetrics.set_id == WorkoutSet.id)
+                 .join(Workout, WorkoutSet.workout_id == Workout.id)
+                 .join(ProgramDay, Workout.program_day == ProgramDay.id)
+                 .where(Workout.user_id == user_id)
+                 .order_by(Workout.date, Workout.id, WorkoutSet.id))
+    if start is not None:
+        statement = statement.where(Workout.date >= start)
+    if end is not None:
+        statement = statement.where(Workout.date <= end)
+    if program_day_id is not None:
+        statement = statement.where(Workout.program_day == program_day_id)
+    if metrics is not None:
+        statement = statement.where(UserWorkoutMetrics.metric.in_(metrics))
+    return session.exec(statement).all()
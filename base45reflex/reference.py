@@ -0,0 +1,113 @@
+"""In memory copy of the small lookup tables that almost never change.
+
+Exercise, ExerciseType, UnitType and UnitConversion are loaded once per process and kept as id -> row dicts. The
+cached copy is versioned by the row count, highest id and a checksum of the values of every table, which is checked at
+most every CHECK_INTERVAL seconds, so rows added or edited by another process are picked up without re-reading the
+tables on every request. Writers in this process call invalidate() to reload straight away.
+"""
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import sqlmodel as sqlm
+from sqlalchemy import String, cast, func
+
+from base45reflex.SQLModels import Exercise, ExerciseType, UnitConversion, UnitType
+
+CHECK_INTERVAL = 30
+
+TABLES = (Exercise, ExerciseType, UnitType, UnitConversion)
+
+# The columns whose in-place updates reload the cache
+CONTENT_COLUMNS = {
+    Exercise: ('name', 'weight_step', 'type'),
+    ExerciseType: ('name',),
+    UnitType: ('name',),
+    UnitConversion: ('first_unit', 'second_unit', 'factor'),
+}
+
+
+class ReferenceData:
+
+    def __init__(self, version: tuple, exercises: Dict[int, dict], exercise_types: Dict[int, dict],
+                 unit_types: Dict[int, dict], unit_conversions: Dict[int, dict]):
+        self.version = version
+        self.exercises = exercises
+        self.exercise_types = exercise_types
+        self.unit_types = unit_types
+        self.unit_conversions = unit_conversions
+        self.exercise_names = {exercise_id: row['name'] for exercise_id, row in exercises.items()}
+        self.exercise_ids = {row['name']: exercise_id for exercise_id, row in exercises.items()}
+        self.unit_names = {unit_id: row['name'] for unit_id, row in unit_types.items()}
+        self.unit_index = {unit_id: index for index, unit_id in enumerate(sorted(unit_types))}
+        # unit_lookup[unit_id] is the unit's row and column in unit_factors, -1 for ids that are not a unit
+        self.unit_lookup = np.full(max(unit_types, default=0) + 1, -1)
+        self.unit_lookup[list(self.unit_index)] = list(self.unit_index.values())
+        self.unit_factors = self._unit_factors()
+
+    def _unit_factors(self) -> np.ndarray:
+        """factors[i, j] converts a value in the unit at index i to the unit at index j, NaN where there is no factor.
+
+        Pairs without a row in unit_conversion are filled in through intermediate units, so kg -> g and g -> oz give
+        kg -> oz.
+        """
+        factors = np.full((len(self.unit_index), len(self.unit_index)), np.nan)
+        np.fill_diagonal(factors, 1.0)
+        for conversion in self.unit_conversions.values():
+            first = self.unit_index[conversion['first_unit']]
+            second = self.unit_index[conversion['second_unit']]
+            factors[first, second] = conversion['factor']
+            factors[second, first] = 1 / conversion['factor']
+        for via in range(len(factors)):
+            factors = np.where(np.isnan(factors), factors[:, via, None] * factors[None, via, :], factors)
+        return factors
+
+
+_reference: Optional[ReferenceData] = None
+_checked = 0.0
+
+
+def version(session: sqlm.Session) -> tuple:
+    """The row count, highest id and content checksum of every reference table, read in a single statement."""
+    columns = []
+    for table in TABLES:
+        columns.append(sqlm.select(func.count(table.id)).scalar_subquery())
+        columns.append(sqlm.select(func.max(table.id)).scalar_subquery())
+        columns.append(sqlm.select(func.sum(checksum(table))).scalar_subquery())
+    return tuple(session.execute(sqlm.select(*columns)).one())
+
+
+def checksum(table):
+    """A number that changes with an in-place update of the row's values, weighted by id so swapped values count too.
+
+    Names count by their length, so a rename to a name of the same length is only picked up by invalidate().
+    """
+    values = []
+    for column in CONTENT_COLUMNS[table]:
+        column = getattr(table, column)
+        values.append(func.length(cast(column, String)) if column.name == 'name' else column)
+    return sum(values[1:], values[0]) * table.id
+
+
+def load(session: sqlm.Session) -> ReferenceData:
+    rows = [{row.id: row.dict() for row in session.exec(sqlm.select(table)).all()} for table in TABLES]
+    return ReferenceData(version(session), *rows)
+
+
+def get_reference(session: sqlm.Session) -> ReferenceData:
+    """The cached reference data, reloaded if the tables changed since it was loaded."""
+    global _reference, _checked
+    now = time.monotonic()
+    if _reference is None:
+        _reference, _checked = load(session), now
+    elif now - _checked > CHECK_INTERVAL:
+        _checked = now
+        if version(session) != _reference.version:
+            _reference = load(session)
+    return _reference
+
+
+def invalidate():
+    """Reload the reference data on the next call to get_reference."""
+    global _reference
+    _reference = None
@@ -1,34 +1,28 @@
+import asyncio
 import json
-import pyrebase as pb
 import re
 import reflex as rx
 import requests.exceptions
 
 from rxconfig import ENVIRONMENT
 
+from base45reflex import auth, database
 from base45reflex.SQLModels import User, Workout
 from pprint import pprint
-from typing import Optional
-
-
-config_path = "base45reflex/firebaseConfig.json"
-config_data = json.load(open(config_path, 'r'))
-firebase = pb.initialize_app(config_data)
-auth = firebase.auth()
-
-
-with rx.session() as session:
-    dev_user = session.exec(User.select.where(User.id == 'XZtDPyiyebWPhCAXYJ8BKuaBJWg2')).first().dict()
-    dev_user['date_of_birth'] = dev_user['date_of_birth'].isoformat()
+from typing import Dict, Optional
 
 
 class State(rx.State):
     """The app state."""
-    user: Optional[dict] = dev_user if ENVIRONMENT == 'DEV' else None
+    user: Optional[dict] = None
     refresh_token: str = ''
 
+    # state -> var -> digest of the value this client was last sent, see base45reflex.deltas
+    _sent_digests: Dict[str, Dict[str, str]] = {}
+
     def logout(self):
         """Log out a user."""
+        auth.revoke(self.refresh_token)
         self.reset()
         return rx.redirect("/")
 
@@ -46,18 +40,27 @@ class State(rx.State):
     def get_refresh_token(self) -> str:
         return self.refresh_token
 
-    def refresh(self):
-        """Get cookies and refresh IdToken"""
-        user = auth.refresh(self.refresh_token)
-        with rx.session() as session:
-            user = session.exec(User.select.where(User.id == user['userId'])).first().dict()
-            self.user = user
+    async def load_dev_user(self):
+        """Log in as the development user, on_load of every page in DEV."""
+        if ENVIRONMENT == 'DEV' and self.user is None:
+            async with database.async_session() as session:
+                self.user = await session.run_sync(auth.dev_user)
 
-    def check_login(self):
+    async def refresh(self):
+        """Get cookies and refresh IdToken"""
+        user = auth.verified_user(self.refresh_token)
+        if user is None:
+            tokens = await asyncio.to_thread(auth.get_auth().refresh, self.refresh_token)
+            async with database.async_session() as session:
+                user = (await session.exec(User.select.where(User.id == tokens['userId']))).first().dict()
+            auth.remember(self.refresh_token, user)
+        self.user = user
+
+    async def check_login(self):
         """Check if a user is logged in."""
         if not self.logged_in:
             try:
-                self.refresh()
+                await self.refresh()
             except KeyError:
                 return rx.redirect("/login")
             except requests.exceptions.HTTPError:
@@ -88,17 +91,18 @@ class LoginState(State):
     def get_login_pass(self, password):
         self.password = password
 
-    def authenticate(self):
+    async def authenticate(self):
         try:
-            user = auth.sign_in_with_email_and_password(self.email, self.password)
+            user = await asyncio.to_thread(auth.get_auth().sign_in_with_email_and_password, self.email, self.password)
             self.refresh_token = user['refreshToken']
             self.save_data('refresh', self.refresh_token)
         except requests.exceptions.HTTPError as e:
             error = json.loads(e.strerror)
             return rx.window_alert(error['error']['message'])
-        with rx.session() as session:
-            user = session.exec(User.select.where(User.id == user['localId'])).first().dict()
+        async with database.async_session() as session:
+            user = (await session.exec(User.select.where(User.id == user['localId']))).first().dict()
             self.user = user
+        auth.remember(self.refresh_token, user)
         return rx.redirect("/")
 
     def reload_page(self):
@@ -0,0 +1,41 @@
+"""Vectorized conversion between the units in unit_types."""
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from base45reflex.reference import ReferenceData
+
+ArrayLike = Union[np.ndarray, pd.Series, list]
+
+
+def convert(values: ArrayLike, unit_ids: ArrayLike, target_unit: Union[int, ArrayLike],
+            reference: ReferenceData) -> Union[np.ndarray, pd.Series]:
+    """Convert every value from its unit to the target unit in one pass.
+
+    target_unit is either one unit id for all values or one per value. Values without a unit, or without a target,
+    are returned unchanged. Values whose units have no conversion path come back as NaN, and unit ids that are not in
+    unit_types raise a ValueError. A Series comes back as a Series with the same index.
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    values = np.asarray(values, dtype=float)
+    source = _unit_positions(unit_ids, len(values), reference)
+    target = _unit_positions(target_unit, len(values), reference)
+    convertible = (source >= 0) & (target >= 0)
+    converted = values.copy()
+    converted[convertible] = values[convertible] * reference.unit_factors[source[convertible], target[convertible]]
+    return converted if index is None else pd.Series(converted, index=index)
+
+
+def _unit_positions(unit_ids: Union[int, ArrayLike], size: int, reference: ReferenceData) -> np.ndarray:
+    """The row of every unit id in the factor matrix, -1 where there is no unit."""
+    unit_ids = pd.to_numeric(pd.Series(np.broadcast_to(np.asarray(unit_ids, dtype=object), size)),
+                             errors='coerce').to_numpy(dtype=float)
+    missing = np.isnan(unit_ids)
+    unit_ids = np.where(missing, 0, unit_ids).astype(int)
+    in_range = (unit_ids >= 0) & (unit_ids < len(reference.unit_lookup))
+    positions = np.where(in_range, reference.unit_lookup[np.where(in_range, unit_ids, 0)], -1)
+    unknown = ~missing & (positions < 0)
+    if unknown.any():
+        raise ValueError(f"Unknown unit ids {sorted(set(unit_ids[unknown].tolist()))}")
+    return np.where(missing, -1, positions)
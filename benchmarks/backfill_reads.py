@@ -0,0 +1,87 @@
+"""Benchmark landing page reads while calculate_metrics recalculates every athlete in another process.
+
+    python -m benchmarks.backfill_reads [--athletes 40] [--weeks 20] [--seconds 8]
+
+The reads are day_indicators for one athlete, in a loop for the given seconds, while a second process runs full
+recalculations of every athlete back to back. It runs once on a SQLite database in the rollback journal mode SQLite
+defaults to and once with DB_PROFILE, printing how many reads finished, their median and 99th percentile latency and
+how many failed on a locked database. In rollback journal mode a read waits while the writer commits, so the gap
+grows with how long the disk takes to sync a commit.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+import calculate_metrics
+from base45reflex.database import create_engine
+from base45reflex.pages.index import day_indicators
+from base45reflex.SQLModels import User
+from rxconfig import DB_PROFILE
+from tests.seed import START, athlete_id, seed
+
+PROFILES = {
+    'rollback journal': {**DB_PROFILE, 'journal_mode': 'DELETE', 'synchronous': 'FULL', 'mmap_size': 0},
+    'DB_PROFILE': DB_PROFILE,
+}
+
+
+def recalculate(url: str, profile: dict, started, stop):
+    """Recalculate every athlete from scratch until told to stop."""
+    with Session(create_engine(url, profile)) as session:
+        users = session.exec(select(User).where(User.role == 'athlete')).all()
+        started.set()
+        while not stop.is_set():
+            for user in users:
+                calculate_metrics.calculate_metrics(user, session, full=True)
+
+
+def bench(name: str, profile: dict, athletes: int, weeks: int, seconds: float, directory: str):
+    url = f"sqlite:///{os.path.join(directory, name.replace(' ', '_') + '.db')}"
+    engine = seed(create_engine(url, profile), athletes=athletes, weeks=weeks)
+    with Session(engine) as session:
+        for user in session.exec(select(User).where(User.role == 'athlete')).all():
+            calculate_metrics.calculate_metrics(user, session)
+
+    started, stop = multiprocessing.Event(), multiprocessing.Event()
+    writer = multiprocessing.Process(target=recalculate, args=(url, profile, started, stop))
+    writer.start()
+    started.wait()
+    timings, failures = [], 0
+    deadline = time.perf_counter() + seconds
+    with Session(engine) as session:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                day_indicators(session, athlete_id(0), 1, START)
+            except OperationalError:
+                failures += 1
+                session.rollback()
+                continue
+            finally:
+                session.close()
+            timings.append(time.perf_counter() - start)
+    stop.set()
+    writer.join()
+    engine.dispose()
+
+    p99 = statistics.quantiles(timings, n=100)[98] if len(timings) > 1 else float('nan')
+    print(f"{name:>16}: {len(timings):6d} reads, p50 {statistics.median(timings) * 1000:6.2f}ms, "
+          f"p99 {p99 * 1000:6.2f}ms, {failures} locked")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark landing page reads during a metrics backfill.")
+    parser.add_argument('--athletes', type=int, default=40, help="athletes recalculated by the writer")
+    parser.add_argument('--weeks', type=int, default=20, help="weeks of workouts per athlete")
+    parser.add_argument('--seconds', type=float, default=8, help="how long to read for")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile_name, db_profile in PROFILES.items():
+            bench(profile_name, db_profile, args.athletes, args.weeks, args.seconds, tmp)
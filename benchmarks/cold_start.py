@@ -0,0 +1,48 @@
+"""Benchmark how long a fresh process takes to import the app state and the metrics job.
+
+    python -m benchmarks.cold_start [--repeat 5]
+
+Every import runs in a new interpreter. For each module the median import time is printed, next to the time of
+importing pyrebase as well, which state.py used to do on import, and whether importing the module pulled pyrebase in.
+Nothing should: the Firebase client is created by auth.get_auth() on the first login. The script exits with status 1 if
+any module imports pyrebase.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = ('base45reflex.state', 'calculate_metrics')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for module in sys.argv[1:]:
+    __import__(module)
+print(json.dumps({'seconds': time.perf_counter() - start, 'pyrebase': 'pyrebase' in sys.modules}))
+"""
+
+
+def import_once(modules) -> dict:
+    result = subprocess.run([sys.executable, '-c', PROBE, *modules], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench(module: str, repeat: int) -> bool:
+    """Print the module's import times, returns whether importing it imported pyrebase."""
+    runs = [import_once([module]) for _ in range(repeat)]
+    with_pyrebase = [import_once([module, 'pyrebase'])['seconds'] for _ in range(repeat)]
+    imported = any(run['pyrebase'] for run in runs)
+    print(f"{module:>20}: {statistics.median(run['seconds'] for run in runs):5.2f}s, "
+          f"with pyrebase {statistics.median(with_pyrebase):5.2f}s, pyrebase imported: {imported}")
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the app and the metrics job.")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per module, the median is printed")
+    args = parser.parse_args()
+
+    if any([bench(name, args.repeat) for name in MODULES]):
+        sys.exit(1)
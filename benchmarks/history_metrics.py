@@ -0,0 +1,83 @@
+"""Benchmark the landing page history metrics as an athlete's history grows from 1 to 5 years of sessions.
+
+    python -m benchmarks.history_metrics [--repeat 5]
+
+Every length of history gets its own SQLite database with one athlete whose metrics were calculated. For each one the
+median time of history_metrics, query included, is printed next to the per group masking it replaced, with the time
+per metric row. history_metrics should stay flat or fall per row as the history grows. The masking's cost also grows
+with the number of (day, exercise, metric) groups, which the generated program keeps small.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+from sqlmodel import Session, create_engine
+
+import calculate_metrics
+from base45reflex.pages.index import history_metrics
+from base45reflex.queries import workout_metrics
+from base45reflex.SQLModels import User
+from tests.seed import START, athlete_id, seed
+
+YEARS = (1, 2, 3, 4, 5)
+
+
+def nested_masks(rows) -> dict:
+    """The metrics the way LandingState.metrics built them, re-filtering the rows for every group."""
+    df = pd.DataFrame(rows, columns=['day_name', 'exercise', 'metric', 'value', 'unit_id', 'date'])
+    df['unit'] = None
+    df.sort_values('date', ascending=True, inplace=True)
+    df['prev'] = df.groupby(['day_name', 'exercise', 'metric'])['value'].shift(1).fillna(0)
+    metrics = {}
+    for day_name in df['day_name'].unique():
+        metrics[day_name] = {}
+        temp = df[df['day_name'] == day_name].copy()
+        dates = temp['date'].unique()
+        dates.sort()
+        most_recent = dates[-1]
+        for exercise in temp['exercise'].unique():
+            metrics[day_name][exercise] = {}
+            ex_metrics = temp[(temp['exercise'] == exercise) & (temp['date'] == most_recent)].to_records()
+            for rec in ex_metrics:
+                metrics[day_name][exercise][rec['metric']] = round(rec["value"], 2)
+                metrics[day_name][exercise][f"{rec['metric']}_prev"] = round(rec['prev'], 2)
+                var = temp[(temp['exercise'] == exercise) & (temp['metric'] == rec['metric'])].copy()
+                metrics[day_name][exercise][f'{rec["metric"]}_var'] = round(var['value'].var(), 2)
+                metrics[day_name][exercise][f'{rec["metric"]}_unit'] = rec['unit']
+    return metrics
+
+
+def median_seconds(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench(years: int, repeat: int, directory: str):
+    engine = seed(create_engine(f"sqlite:///{os.path.join(directory, f'{years}y.db')}"), athletes=1, weeks=years * 52)
+    user_id = athlete_id(0)
+    with Session(engine) as session:
+        calculate_metrics.calculate_metrics(session.get(User, user_id), session)
+        rows = workout_metrics(session, user_id, START, metrics=calculate_metrics.METRICS)
+        grouped = median_seconds(lambda: history_metrics(session, user_id, START), repeat)
+        masked = median_seconds(lambda: nested_masks(workout_metrics(session, user_id, START,
+                                                                     metrics=calculate_metrics.METRICS)), repeat)
+    print(f"{years} years, {len(rows):6d} rows: history_metrics {grouped * 1000:7.1f}ms "
+          f"({grouped / len(rows) * 1e6:5.1f}us/row), nested masks {masked * 1000:7.1f}ms "
+          f"({masked / len(rows) * 1e6:5.1f}us/row)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark history_metrics as the history grows.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per length of history, the median is printed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for length in YEARS:
+            bench(length, args.repeat, tmp)
@@ -1,49 +1,315 @@
-from base45reflex.SQLModels import Exercise, User, UserProgramHistory, Workout, WorkoutSet, UserWorkoutMetrics
+import argparse
+import datetime
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple
+
+import numpy as np
 import pandas as pd
-from sqlmodel import Session, create_engine, select
-from rxconfig import ENVIRONMENT
-
-
-def calculate_metrics(user: User, session: Session):
-    program_history_statement = UserProgramHistory.select.filter(UserProgramHistory.user_id == user.id)
-    program_history = session.scalars(program_history_statement).all()
-    for program in program_history:
-        workout_statement = (Workout.select.filter(Workout.user_id == user.id)
-                             .filter(Workout.date <= program.end_date)
-                             .filter(Workout.date >= program.start_date))
-        workout_list = session.scalars(workout_statement).all()
-        if not workout_list:
-            continue
-        for workout in workout_list:
-            set_statement = select(WorkoutSet, Exercise).join(Exercise).where(WorkoutSet.workout_id == workout.id)
-            set_list = sess.exec(set_statement).all()
-            for ex_set in set_list:
-                temp_set = ex_set[0]
-                exercise = ex_set[1]
-                load_value = temp_set.weight * temp_set.num_sets
-                load = UserWorkoutMetrics(set_id=temp_set.id, user_id=user.id, metric='TotalLoad', date=workout.date,
-                                          exercise=exercise.name, value=load_value, unit_id=temp_set.unit_id)
-                avg_rpe = UserWorkoutMetrics(set_id=temp_set.id, user_id=user.id, value=temp_set.avg_rpe,
-                                             date=workout.date, exercise=exercise.name, metric='AvgRPE')
-                avg_reps = UserWorkoutMetrics(set_id=temp_set.id, user_id=user.id, metric='AvgRepsPerSet',
-                                              date=workout.date, exercise=exercise.name,
-                                              value=temp_set.reps/temp_set.num_sets)
-                sess.add(load)
-                sess.add(avg_rpe)
-                sess.add(avg_reps)
-                sess.commit()
+from base45reflex import analytics
+from base45reflex.database import create_engine, upsert
+from base45reflex.indicators import payload, summary_metrics
+from base45reflex.reference import ReferenceData, get_reference
+from base45reflex.units import convert
+from base45reflex.SQLModels import (User, UserIndicatorPayload, UserMetricSummary, UserMetricsWatermark,
+                                    UserProgramHistory, Workout, WorkoutSet, UserWorkoutMetrics)
+from sqlalchemy import delete, func, insert, tuple_
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+from rxconfig import config
+
+
+METRICS = ('TotalLoad', 'AvgRPE', 'AvgRepsPerSet')
+METRIC_COLUMNS = ('user_id', 'unit_id', 'date', 'exercise', 'value')
+SUMMARY_KEYS = ['user_program_history_id', 'program_day_id', 'exercise', 'metric']
+SUMMARY_COLUMNS = ('unit_id', 'latest_date', 'latest_set_id', 'latest', 'prev', 'count', 'mean', 'm2')
+
+
+def program_sets_statement(user_id: str):
+    """The user's sets that fall inside one of their program windows, with the id of the program block.
+
+    A set inside several windows belongs to the block that started last.
+    """
+    in_program = (select(UserProgramHistory.id)
+                  .where(UserProgramHistory.user_id == user_id)
+                  .where(Workout.date >= UserProgramHistory.start_date)
+                  .where(Workout.date <= UserProgramHistory.end_date))
+    block = (in_program.order_by(UserProgramHistory.start_date.desc(), UserProgramHistory.id.desc()).limit(1)
+             .scalar_subquery().label('user_program_history_id'))
+    return (select(WorkoutSet.id.label('set_id'), Workout.date, Workout.program_day, block, WorkoutSet.exercise_id,
+                   WorkoutSet.weight, WorkoutSet.reps, WorkoutSet.num_sets, WorkoutSet.avg_rpe, WorkoutSet.unit_id)
+            .join(Workout, WorkoutSet.workout_id == Workout.id)
+            .where(Workout.user_id == user_id)
+            .where(in_program.exists())
+            .order_by(WorkoutSet.id))
+
+
+def pending_sets_statement(user_id: str, last_set_id: int):
+    """Sets newer than the user's watermark that fall inside one of their program windows.
+
+    The watermark moves to the newest set read, so a set logged before a program window covering its date was added
+    is passed over once a later set has been calculated. It is only picked up again by a full run.
+    """
+    return program_sets_statement(user_id).where(WorkoutSet.id > last_set_id)
+
+
+def load_sets(session: Session, statement) -> pd.DataFrame:
+    result = session.execute(statement)
+    sets = pd.DataFrame(result.all(), columns=list(result.keys()))
+    sets['exercise'] = sets['exercise_id'].map(get_reference(session).exercise_names)
+    return sets
+
+
+def load_pending_sets(session: Session, user_id: str, last_set_id: int) -> pd.DataFrame:
+    return load_sets(session, pending_sets_statement(user_id, last_set_id))
+
+
+def metric_rows(sets: pd.DataFrame, user_id: str) -> pd.DataFrame:
+    """Turn one row per set into one row per (set, metric)."""
+    sets = sets.assign(TotalLoad=sets['weight'] * sets['num_sets'],
+                       AvgRPE=sets['avg_rpe'],
+                       AvgRepsPerSet=sets['reps'] / sets['num_sets'])
+    rows = sets.melt(id_vars=['set_id', 'date', 'program_day', 'user_program_history_id', 'exercise', 'unit_id'],
+                     value_vars=list(METRICS),
+                     var_name='metric', value_name='value')
+    # Only the load is measured in a unit
+    rows['unit_id'] = rows['unit_id'].astype(object).where(rows['metric'] == 'TotalLoad', None)
+    rows['user_id'] = user_id
+    return rows
+
+
+def upsert_metrics_statement(bind: Engine):
+    return upsert(bind, UserWorkoutMetrics.__table__, ['set_id', 'metric'], METRIC_COLUMNS)
+
+
+def upsert_summary_statement(bind: Engine):
+    return upsert(bind, UserMetricSummary.__table__, ['user_id', *SUMMARY_KEYS], SUMMARY_COLUMNS)
+
+
+def load_summary(session: Session, user_id: str) -> pd.DataFrame:
+    result = session.execute(select(*[getattr(UserMetricSummary, column) for column in (*SUMMARY_KEYS, *SUMMARY_COLUMNS)])
+                             .where(UserMetricSummary.user_id == user_id))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def summarize(rows: pd.DataFrame, existing: pd.DataFrame, reference: ReferenceData) -> pd.DataFrame:
+    """Fold newly calculated metric rows into the stored running summary.
+
+    Each (program block, program day, exercise, metric) group of the batch is reduced to its count, mean and sum of
+    squared deviations, and combined with the stored values using Chan's parallel variance update. The batch's last
+    value becomes the latest one unless the stored latest set is newer. Like history_metrics, a group is summarised in
+    the unit of its latest set: the batch is converted to the unit of its own latest set, and whichever side is not in
+    the unit of the group's latest set is re-based into it, so a run over new sets and a --full run agree.
+    """
+    rows = rows.dropna(subset=['program_day']).rename(columns={'program_day': 'program_day_id'})
+    rows = rows.astype({'program_day_id': int, 'user_program_history_id': int}).sort_values(['date', 'set_id'])
+    latest_unit = rows.groupby(SUMMARY_KEYS)['unit_id'].transform('last')
+    rows['value'] = convert(rows['value'].to_numpy(), rows['unit_id'], latest_unit.to_numpy(dtype=float), reference)
+    rows['unit_id'] = latest_unit
+    rows['prev'] = rows.groupby(SUMMARY_KEYS)['value'].shift(1)
+    batch = rows.groupby(SUMMARY_KEYS).agg(count_b=('value', 'count'), mean_b=('value', 'mean'),
+                                           var_b=('value', 'var'), latest_b=('value', 'last'),
+                                           prev_b=('prev', 'last'), unit_id_b=('unit_id', 'last'),
+                                           latest_date_b=('date', 'last'), latest_set_id_b=('set_id', 'last'))
+    existing = existing.astype({column: float for column in ('latest_set_id', 'latest', 'prev', 'count', 'mean', 'm2')})
+    summary = batch.reset_index().merge(existing, on=SUMMARY_KEYS, how='left')
+    summary['latest_date'] = pd.to_datetime(summary['latest_date'])
+    summary['latest_date_b'] = pd.to_datetime(summary['latest_date_b'])
+    newer = (summary['latest_date'].isna() | (summary['latest_date_b'] > summary['latest_date'])
+             | ((summary['latest_date_b'] == summary['latest_date'])
+                & (summary['latest_set_id_b'] >= summary['latest_set_id'].fillna(0))))
+
+    # Re-base both sides into the unit of the group's latest set, a unit change scales the mean by the conversion
+    # factor and the sum of squared deviations by its square
+    target_unit = summary['unit_id_b'].where(newer, summary['unit_id']).to_numpy(dtype=float)
+    ones = np.ones(len(summary))
+    batch_factor = convert(ones, summary['unit_id_b'], target_unit, reference)
+    stored_factor = convert(ones, summary['unit_id'], target_unit, reference)
+    for column in ('mean_b', 'latest_b', 'prev_b'):
+        summary[column] = summary[column] * batch_factor
+    summary['var_b'] = summary['var_b'] * batch_factor ** 2
+    for column in ('mean', 'latest', 'prev'):
+        summary[column] = summary[column] * stored_factor
+    summary['m2'] = summary['m2'] * stored_factor ** 2
+    summary['unit_id'] = target_unit
+    summary['unit_id_b'] = target_unit
+
+    count = summary['count'].fillna(0)
+    mean = summary['mean'].fillna(0)
+    total = count + summary['count_b']
+    delta = summary['mean_b'] - mean
+    summary['mean'] = mean + delta * summary['count_b'] / total
+    summary['m2'] = (summary['m2'].fillna(0) + summary['var_b'].fillna(0) * (summary['count_b'] - 1)
+                     + delta ** 2 * count * summary['count_b'] / total)
+    summary['count'] = total
+
+    summary['prev'] = summary['prev'].where(~newer, summary['prev_b'].fillna(summary['latest']).fillna(0))
+    for column in ('latest', 'latest_date', 'latest_set_id'):
+        summary[column] = summary[column].where(~newer, summary[f'{column}_b'])
+
+    summary['latest_date'] = summary['latest_date'].dt.date
+    for column in ('unit_id', 'latest_set_id', 'count'):
+        summary[column] = summary[column].astype('Int64').astype(object).where(summary[column].notna(), None)
+    return summary[[*SUMMARY_KEYS, *SUMMARY_COLUMNS]]
+
+
+def upsert_watermark_statement(bind: Engine, user_id: str, last_set_id: int):
+    statement = upsert(bind, UserMetricsWatermark.__table__, ['user_id'], ['last_set_id', 'updated'])
+    return statement.values(user_id=user_id, last_set_id=last_set_id, updated=datetime.datetime.now())
+
+
+def compute_analytics(session: Session, user_id: str, sets: pd.DataFrame) -> pd.DataFrame:
+    """The analytics rows of the pending sets, and of every training day from the first pending one on.
+
+    The rolling windows read the sets of the LOOKBACK_DAYS before the first pending set too.
+    """
+    reference = get_reference(session)
+    first = sets['date'].min()
+    window = load_sets(session, program_sets_statement(user_id)
+                       .where(Workout.date >= first - datetime.timedelta(days=analytics.LOOKBACK_DAYS)))
+    program_sets = program_sets_statement(user_id).order_by(None).subquery()
+    result = session.execute(select(program_sets.c.exercise_id, func.min(program_sets.c.date).label('first_date'))
+                             .group_by(program_sets.c.exercise_id))
+    first_dates = pd.DataFrame(result.all(), columns=list(result.keys()))
+    first_dates = first_dates.assign(user_id=user_id, exercise=first_dates['exercise_id'].map(reference.exercise_names))
+    rows = analytics.analytics_rows(window.assign(user_id=user_id), reference, first_dates)
+    pending = rows['set_id'].isin(sets['set_id'])
+    return rows[pending | (rows['metric'].isin(analytics.DAY_ANALYTICS) & (rows['date'] >= first))]
+
+
+def compute_user_metrics(session: Session, user_id: str, full: bool = False):
+    """Read the user's pending sets and compute their metric rows without writing anything.
+
+    Returns the metric rows, the new watermark and the number of sets that were read.
+    """
+    watermark = session.get(UserMetricsWatermark, user_id)
+    last_set_id = 0 if full or watermark is None else watermark.last_set_id
+    sets = load_pending_sets(session, user_id, last_set_id)
+    if sets.empty:
+        return None, last_set_id, 0
+    rows = pd.concat([metric_rows(sets, user_id), compute_analytics(session, user_id, sets)], ignore_index=True)
+    return rows, max(last_set_id, int(sets['set_id'].max())), len(sets)
+
+
+def refresh_payloads(session: Session, user_id: str, days: List[Tuple[int, int]], reference: ReferenceData):
+    """Render the indicator payloads of the (program block, program day) pairs again from their summary rows."""
+    summary = load_summary(session, user_id)
+    in_days = pd.MultiIndex.from_frame(summary[['user_program_history_id', 'program_day_id']]).isin(days)
+    metrics = summary_metrics(((row, (int(row.user_program_history_id), int(row.program_day_id)))
+                               for row in summary[in_days].itertuples()), reference.unit_names)
+    session.execute(delete(UserIndicatorPayload)
+                    .where(UserIndicatorPayload.user_id == user_id)
+                    .where(tuple_(UserIndicatorPayload.user_program_history_id,
+                                  UserIndicatorPayload.program_day_id).in_(days)))
+    rows = [dict(user_id=user_id, user_program_history_id=block, program_day_id=program_day_id, exercise=exercise,
+                 payload=json.dumps(payload(exercise, ex_metrics)))
+            for (block, program_day_id), day_metrics in metrics.items()
+            for exercise, ex_metrics in day_metrics.items()]
+    if rows:
+        session.execute(insert(UserIndicatorPayload.__table__), rows)
+
+
+def write_user_metrics(session: Session, user_id: str, rows: pd.DataFrame, last_set_id: int, full: bool = False):
+    """Upsert the metric rows, fold them into the summary and move the watermark in a single transaction.
+
+    Users without a watermark have had all of their sets calculated, so their summary is rebuilt like with full. The
+    daily analytics from the first day of the rows on are replaced, as the last set of a day can change.
+    """
+    reference = get_reference(session)
+    bind = session.get_bind()
+    session.execute(delete(UserWorkoutMetrics)
+                    .where(UserWorkoutMetrics.user_id == user_id)
+                    .where(UserWorkoutMetrics.metric.in_(analytics.DAY_ANALYTICS))
+                    .where(UserWorkoutMetrics.date >= rows['date'].min()))
+    session.execute(upsert_metrics_statement(bind), rows[['set_id', 'metric', *METRIC_COLUMNS]].to_dict('records'))
+    if full or session.get(UserMetricsWatermark, user_id) is None:
+        session.execute(delete(UserMetricSummary).where(UserMetricSummary.user_id == user_id))
+        session.execute(delete(UserIndicatorPayload).where(UserIndicatorPayload.user_id == user_id))
+    summary = summarize(rows[rows['metric'].isin(METRICS)], load_summary(session, user_id), reference)
+    if not summary.empty:
+        session.execute(upsert_summary_statement(bind), summary.assign(user_id=user_id).to_dict('records'))
+        days = summary[['user_program_history_id', 'program_day_id']].drop_duplicates()
+        refresh_payloads(session, user_id, [(int(block), int(day)) for block, day in days.itertuples(index=False)],
+                         reference)
+    session.execute(upsert_watermark_statement(bind, user_id, last_set_id))
+    session.commit()
+
+
+def calculate_metrics(user: User, session: Session, full: bool = False):
+    """Calculate the metrics for every set the user logged since the last run.
+
+    Metrics are upserted on (set_id, metric) so running this twice over the same sets is harmless. With full=True the
+    watermark is ignored and every set is recalculated. That is needed after editing sets that were already processed,
+    and after adding or moving a program window over the dates of sets logged earlier.
+    """
+    rows, last_set_id, set_count = compute_user_metrics(session, user.id, full)
+    if rows is not None:
+        write_user_metrics(session, user.id, rows, last_set_id, full)
+    return set_count
+
+
+_worker_engine = None
+
+
+def _init_worker(db_url: str):
+    global _worker_engine
+    _worker_engine = create_engine(db_url)
+
+
+def _compute_partition(user_ids: List[str], full: bool):
+    """Worker side of the backfill, computes every user in the partition on the worker's own engine."""
+    start = time.perf_counter()
+    results = []
+    with Session(_worker_engine) as session:
+        for user_id in user_ids:
+            results.append((user_id, *compute_user_metrics(session, user_id, full)))
+    return os.getpid(), time.perf_counter() - start, results
+
+
+def backfill(db_url: str, user_ids: List[str], workers: int, full: bool = False):
+    """Calculate metrics for the users on a process pool.
+
+    The users are dealt round-robin into a few partitions per worker so a slow user does not hold up a whole worker's
+    share. Workers only read; every write goes through this process, so SQLite only ever sees one writer.
+    """
+    partitions = [user_ids[i::workers * 4] for i in range(workers * 4)]
+    stats = defaultdict(lambda: {'users': 0, 'sets': 0, 'seconds': 0.0})
+    with Session(create_engine(db_url)) as session, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_url,)) as pool:
+        futures = [pool.submit(_compute_partition, partition, full) for partition in partitions if partition]
+        for future in as_completed(futures):
+            pid, seconds, results = future.result()
+            stats[pid]['seconds'] += seconds
+            for user_id, rows, last_set_id, set_count in results:
+                stats[pid]['users'] += 1
+                stats[pid]['sets'] += set_count
+                if rows is not None:
+                    write_user_metrics(session, user_id, rows, last_set_id, full)
+    return dict(stats)
 
 
 if __name__ == "__main__":
-    if ENVIRONMENT == "DEV":
-        db_url = "sqlite:///reflex_dev.db"
-    else:
-        db_url = "sqlite:///reflex.db"
+    parser = argparse.ArgumentParser(description="Calculate workout metrics for every user.")
+    parser.add_argument('--full', action='store_true', help="ignore the watermark and recalculate every set")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes to compute metrics with")
+    args = parser.parse_args()
 
+    db_url = config.db_url
     engine = create_engine(db_url)
 
-    with Session(engine) as sess:
-        user_list = sess.scalars(User.select.filter()).all()
+    if args.workers > 1:
+        with Session(engine) as sess:
+            user_ids = sess.exec(select(User.id)).all()
+        for pid, worker in backfill(db_url, user_ids, args.workers, full=args.full).items():
+            rate = worker['sets'] / worker['seconds'] if worker['seconds'] else 0
+            print(f"worker {pid}: {worker['users']} users, {worker['sets']} sets in {worker['seconds']:.2f}s "
+                  f"({rate:.0f} sets/sec)")
+    else:
+        with Session(engine) as sess:
+            user_list = sess.scalars(User.select.filter()).all()
 
-        for user in user_list:
-            calculate_metrics(user, sess)
+            for user in user_list:
+                calculate_metrics(user, sess, full=args.full)
@@ -0,0 +1,195 @@
+"""Export the training log into Parquet or Arrow files partitioned by user and month, for analysis off the app database.
+
+Every workout set becomes one row with its workout's fields and its TotalLoad, AvgRPE and AvgRepsPerSet metrics. The
+files are laid out as
+
+    <root>/user_id=<user>/month=<YYYY-MM>/part-<first set id>-<last set id>.parquet (or .arrow)
+
+and <root>/_manifest.json keeps the highest set id exported for every user, so the next run only appends newer sets.
+Only sets calculate_metrics has already processed are exported, so the metric columns of a written file never change;
+--all-sets exports the rest too, with empty metric columns. Arrow files are written uncompressed and open_dataset
+memory maps them.
+
+Needs pyarrow, installed with the export extra.
+"""
+import argparse
+import json
+import os
+import time
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from sqlmodel import Session, select
+
+from base45reflex.database import create_engine
+from base45reflex.reference import get_reference
+from base45reflex.SQLModels import User, UserMetricsWatermark, UserWorkoutMetrics, Workout, WorkoutSet
+from rxconfig import config
+
+METRICS = ('TotalLoad', 'AvgRPE', 'AvgRepsPerSet')
+
+CHUNK_SIZE = 50000
+
+MANIFEST = '_manifest.json'
+
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+SCHEMA = pa.schema([
+    ('set_id', pa.int64()),
+    ('workout_id', pa.int64()),
+    ('date', pa.date32()),
+    ('program_day', pa.int64()),
+    ('deload', pa.bool_()),
+    ('exercise_id', pa.int64()),
+    ('exercise', pa.string()),
+    ('set_order', pa.int64()),
+    ('weight', pa.float64()),
+    ('unit_id', pa.int64()),
+    ('reps', pa.int64()),
+    ('num_sets', pa.int64()),
+    ('avg_rpe', pa.float64()),
+    *[(metric, pa.float64()) for metric in METRICS],
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('user_id', pa.string()), ('month', pa.string())]), flavor='hive')
+
+
+def sets_statement(user_id: str, after: int, upto: Optional[int], limit: int):
+    statement = (select(WorkoutSet.id.label('set_id'), WorkoutSet.workout_id, Workout.date, Workout.program_day,
+                        Workout.deload, WorkoutSet.exercise_id, WorkoutSet.set_order, WorkoutSet.weight,
+                        WorkoutSet.unit_id, WorkoutSet.reps, WorkoutSet.num_sets, WorkoutSet.avg_rpe)
+                 .join(Workout, WorkoutSet.workout_id == Workout.id)
+                 .where(Workout.user_id == user_id)
+                 .where(WorkoutSet.id > after)
+                 .order_by(WorkoutSet.id)
+                 .limit(limit))
+    if upto is not None:
+        statement = statement.where(WorkoutSet.id <= upto)
+    return statement
+
+
+def load_chunk(session: Session, user_id: str, after: int, upto: Optional[int], limit: int) -> pd.DataFrame:
+    """The next chunk of the user's sets after the set id, with their metrics as columns."""
+    result = session.execute(sets_statement(user_id, after, upto, limit))
+    sets = pd.DataFrame(result.all(), columns=list(result.keys()))
+    if sets.empty:
+        return sets
+    metrics = session.execute(select(UserWorkoutMetrics.set_id, UserWorkoutMetrics.metric, UserWorkoutMetrics.value)
+                              .where(UserWorkoutMetrics.user_id == user_id)
+                              .where(UserWorkoutMetrics.metric.in_(METRICS))
+                              .where(UserWorkoutMetrics.set_id > after)
+                              .where(UserWorkoutMetrics.set_id <= int(sets['set_id'].iloc[-1]))).all()
+    metrics = pd.DataFrame(metrics, columns=['set_id', 'metric', 'value'])
+    metrics = metrics.pivot(index='set_id', columns='metric', values='value').reindex(columns=list(METRICS))
+    sets = sets.join(metrics, on='set_id')
+    sets['exercise'] = sets['exercise_id'].map(get_reference(session).exercise_names)
+    sets['date'] = pd.to_datetime(sets['date'])
+    return sets
+
+
+def write_partitions(root: str, user_id: str, sets: pd.DataFrame, file_format: str) -> List[str]:
+    """Write one file per month of the chunk, returns their paths."""
+    paths = []
+    for month, month_sets in sets.groupby(sets['date'].dt.strftime('%Y-%m')):
+        month_sets = month_sets.assign(date=month_sets['date'].dt.date)
+        table = pa.Table.from_pandas(month_sets[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+        directory = os.path.join(root, f'user_id={user_id}', f'month={month}')
+        os.makedirs(directory, exist_ok=True)
+        name = (f"part-{int(month_sets['set_id'].iloc[0]):012d}-{int(month_sets['set_id'].iloc[-1]):012d}."
+                f"{EXTENSIONS[file_format]}")
+        path = os.path.join(directory, name)
+        # Written under a dot name, which datasets skip, and renamed once complete
+        temporary = os.path.join(directory, f'.{name}')
+        if file_format == 'parquet':
+            pq.write_table(table, temporary, compression='zstd')
+        else:
+            with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(temporary, path)
+        paths.append(path)
+    return paths
+
+
+def read_manifest(root: str, file_format: str) -> dict:
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {'format': file_format, 'users': {}}
+    with open(path, 'r') as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest['format'] != file_format:
+        raise ValueError(f"{root} holds {manifest['format']} files, not {file_format}")
+    return manifest
+
+
+def write_manifest(root: str, manifest: dict):
+    temporary = os.path.join(root, f'.{MANIFEST}')
+    with open(temporary, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(temporary, os.path.join(root, MANIFEST))
+
+
+def export_user(session: Session, root: str, user_id: str, manifest: dict, file_format: str = 'parquet',
+                all_sets: bool = False, chunk_size: int = CHUNK_SIZE) -> int:
+    """Append the user's sets newer than the manifest to the export, returns the number of sets written.
+
+    The manifest is saved after every chunk, so an interrupted export picks up where it stopped.
+    """
+    user = manifest['users'].setdefault(user_id, {'last_set_id': 0, 'rows': 0})
+    upto = None
+    if not all_sets:
+        watermark = session.get(UserMetricsWatermark, user_id)
+        if watermark is None:
+            return 0
+        upto = watermark.last_set_id
+    count = 0
+    while True:
+        sets = load_chunk(session, user_id, user['last_set_id'], upto, chunk_size)
+        if sets.empty:
+            return count
+        write_partitions(root, user_id, sets, file_format)
+        user['last_set_id'] = int(sets['set_id'].iloc[-1])
+        user['rows'] += len(sets)
+        count += len(sets)
+        write_manifest(root, manifest)
+
+
+def export(db_url: str, root: str, user_ids: Optional[List[str]] = None, file_format: str = 'parquet',
+           all_sets: bool = False, chunk_size: int = CHUNK_SIZE) -> int:
+    """Append the newer sets of the users, or of everyone, to the export at root, returns the number of sets written."""
+    os.makedirs(root, exist_ok=True)
+    manifest = read_manifest(root, file_format)
+    count = 0
+    with Session(create_engine(db_url)) as session:
+        if user_ids is None:
+            user_ids = session.exec(select(User.id)).all()
+        for user_id in user_ids:
+            count += export_user(session, root, user_id, manifest, file_format, all_sets, chunk_size)
+    return count
+
+
+def open_dataset(root: str) -> ds.Dataset:
+    """The export at root as one pyarrow dataset, with user_id and month columns from the partitions."""
+    with open(os.path.join(root, MANIFEST), 'r') as manifest_file:
+        file_format = json.load(manifest_file)['format']
+    return ds.dataset(root, format='parquet' if file_format == 'parquet' else 'ipc', partitioning=PARTITIONING,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the training log into partitioned Parquet or Arrow files.")
+    parser.add_argument('root', help="directory to export into")
+    parser.add_argument('--user', action='append', dest='users', help="only export this user, can be repeated")
+    parser.add_argument('--format', choices=tuple(EXTENSIONS), default='parquet', help="file format to write")
+    parser.add_argument('--all-sets', action='store_true',
+                        help="also export sets calculate_metrics has not processed, without their metrics")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="sets read and written at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    exported = export(config.db_url, args.root, args.users, args.format, args.all_sets, args.chunk_size)
+    seconds = time.perf_counter() - start
+    print(f"exported {exported} sets in {seconds:.2f}s ({exported / seconds if seconds else 0:.0f} sets/sec)")
@@ -1,59 +1,149 @@
-import sqlalchemy.exc
-from sqlalchemy import create_engine, MetaData, event
-from sqlalchemy.sql import sqltypes
+"""Copy every table of one database into another, a chunk of rows at a time.
+
+Rows are streamed from the source in primary key order, CHUNK_SIZE at a time, and each chunk is written to the target
+with one executemany in its own transaction. Rows that already exist in the target, by primary key or a unique index,
+are skipped or upserted one by one instead of stopping the table. On Postgres every table's id sequence is moved past
+the ids copied in, so the app's inserts do not reuse them.
+
+    python init_db.py --source sqlite:///reflex_test.db --target sqlite:///reflex_dev.db --on-conflict upsert
+"""
+import argparse
+import time
+
+from sqlalchemy import MetaData, UniqueConstraint, create_engine, event, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from base45reflex.database import create_engine as create_target_engine, insert_new, upsert
 
 #  Requires SQLALCHEMY 1.4+
 
-src_engine = create_engine("sqlite:///reflex_test.db")
-src_metadata = MetaData(bind=src_engine)
-exclude_tables = ('sqlite_master', 'sqlite_sequence', 'sqlite_temp_master', 'user_workout_metrics', 'unit_conversion',
-                  )
+CHUNK_SIZE = 5000
+
+# The tables the jobs derive from the workouts are left out with user_workout_metrics, so the target's jobs rebuild them
+# from its own rows instead of starting from a watermark or summary of metrics it does not have
+DERIVED_TABLES = ('user_workout_metrics', 'user_metrics_watermark', 'user_metric_summary', 'user_indicator_payloads',
+                  'predictions', 'program_history_prediction', 'exercise_rep_range_stats')
+
+EXCLUDE_TABLES = ('sqlite_master', 'sqlite_sequence', 'sqlite_temp_master', 'alembic_version', 'unit_conversion',
+                  *DERIVED_TABLES)
 
-tgt_engine = create_engine("sqlite:///reflex_dev.db")
-tgt_metadata = MetaData(bind=tgt_engine)
 
-@event.listens_for(src_metadata, "column_reflect")
 def genericize_datatypes(inspector, tablename, column_dict):
-   column_dict["type"] = column_dict["type"].as_generic(allow_nulltype=True)
-"""
-tgt_conn = tgt_engine.connect()
-tgt_metadata.reflect()
-
-# drop all tables in target database
-for table in reversed(tgt_metadata.sorted_tables):
-   if table.name not in exclude_tables:
-      print('dropping table =', table.name)
-      table.drop()
-
-# # Delete all data in target database
-# for table in reversed(tgt_metadata.sorted_tables):
-#    table.delete()
-
-tgt_metadata.clear()
-tgt_metadata.reflect()
-src_metadata.reflect()
-
-# create all tables in target database
-for table in src_metadata.sorted_tables:
-   if table.name not in exclude_tables:
-      table.create(bind=tgt_engine)
-
-# refresh metadata before you can copy data
-tgt_metadata.clear()
-tgt_metadata.reflect()
-"""
+    column_dict["type"] = column_dict["type"].as_generic(allow_nulltype=True)
+
+
+def unique_keys(table) -> list:
+    """The column names of the table's primary key and of each of its unique indexes and constraints."""
+    keys = [[column.name for column in table.primary_key.columns]]
+    keys += [[column.name for column in index.columns] for index in table.indexes if index.unique]
+    keys += [[column.name for column in constraint.columns] for constraint in table.constraints
+             if isinstance(constraint, UniqueConstraint)]
+    return [key for key in keys if key]
+
+
+def insert_statement(target: Connection, table, columns, on_conflict: str, key=None):
+    """The insert for one chunk, rows already in the target are upserted on the key, the primary key by default, or
+    skipped."""
+    primary_key = [column.name for column in table.primary_key.columns]
+    key = key or primary_key
+    updates = [column for column in columns if column not in key and column not in primary_key]
+    if on_conflict == 'upsert' and key and updates:
+        return upsert(target, table, key, updates)
+    return insert_new(target, table)
+
+
+def insert_rows(target: Connection, table, columns, on_conflict: str, rows: list) -> int:
+    """Insert the rows one at a time, upserting on the first unique key a row does not clash on, returns the number of
+    rows that clashed on all of them and were skipped."""
+    statements = [insert_new(target, table)]
+    if on_conflict == 'upsert' and unique_keys(table):
+        statements = [insert_statement(target, table, columns, on_conflict, key) for key in unique_keys(table)]
+    skipped = 0
+    for row in rows:
+        for statement in statements:
+            try:
+                target.execute(statement, row)
+                target.commit()
+                break
+            except IntegrityError:
+                target.rollback()
+        else:
+            skipped += 1
+    return skipped
+
+
+def reset_sequence(target: Connection, table):
+    """Move a Postgres serial primary key's sequence past the highest id copied in."""
+    if target.dialect.name != 'postgresql' or len(table.primary_key.columns) != 1:
+        return
+    column = next(iter(table.primary_key.columns))
+    highest = func.max(column)
+    target.execute(select(func.setval(func.pg_get_serial_sequence(table.name, column.name),
+                                      func.coalesce(highest, 1), highest.isnot(None))).select_from(table))
+    target.commit()
+
+
+def copy_table(source: Connection, target: Connection, source_table, target_table, on_conflict: str,
+               chunk_size: int = CHUNK_SIZE):
+    """Stream the rows of the source table into the target table, returns the number of rows read and skipped.
+
+    A chunk that clashes with the target on a unique index the statement does not handle is written again row by row.
+    """
+    columns = [column.name for column in source_table.columns if column.name in target_table.columns]
+    statement = insert_statement(target, target_table, columns, on_conflict)
+    query = select(*[source_table.columns[column] for column in columns]).order_by(*source_table.primary_key.columns)
+    result = source.execution_options(stream_results=True).execute(query)
+    count = skipped = 0
+    for rows in result.mappings().partitions(chunk_size):
+        rows = [dict(row) for row in rows]
+        try:
+            target.execute(statement, rows)
+            target.commit()
+        except IntegrityError:
+            target.rollback()
+            skipped += insert_rows(target, target_table, columns, on_conflict, rows)
+        count += len(rows)
+    reset_sequence(target, target_table)
+    return count, skipped
+
+
+def copy_database(source_url: str, target_url: str, on_conflict: str = 'skip', chunk_size: int = CHUNK_SIZE,
+                  exclude=EXCLUDE_TABLES):
+    """Copy every table both databases have, parents before children, returns (table, rows, skipped, seconds) per
+    table."""
+    source_metadata = MetaData()
+    event.listen(source_metadata, "column_reflect", genericize_datatypes)
+    target_metadata = MetaData()
+    stats = []
+    with create_engine(source_url).connect() as source, create_target_engine(target_url).connect() as target:
+        source_metadata.reflect(bind=source)
+        target_metadata.reflect(bind=target)
+        target.commit()
+        for table in source_metadata.sorted_tables:
+            if table.name in exclude or table.name not in target_metadata.tables:
+                continue
+            start = time.perf_counter()
+            count, skipped = copy_table(source, target, table, target_metadata.tables[table.name], on_conflict,
+                                        chunk_size)
+            stats.append((table.name, count, skipped, time.perf_counter() - start))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the rows of every table from one database to another.")
+    parser.add_argument('--source', default="sqlite:///reflex_test.db", help="database url to copy from")
+    parser.add_argument('--target', default="sqlite:///reflex_dev.db", help="database url to copy into")
+    parser.add_argument('--on-conflict', choices=('skip', 'upsert'), default='skip',
+                        help="what to do with rows that already exist in the target")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="rows read and written at a time")
+    args = parser.parse_args()
 
-src_metadata.clear()
-tgt_metadata.reflect()
-src_metadata.reflect()
-
-# Copy all data from src to target
-for table in src_metadata.sorted_tables:
-   try:
-      tgt_table = tgt_metadata.tables[table.name]
-      stmt = tgt_table.insert()
-      for index, row in enumerate(table.select().execute()):
-         print("table =", tgt_table.name, "Inserting row", index)
-         stmt.execute(row._asdict())
-   except sqlalchemy.exc.IntegrityError:
-      continue
\ No newline at end of file
+    total_rows = total_seconds = 0
+    for name, rows, skipped, seconds in copy_database(args.source, args.target, args.on_conflict, args.chunk_size):
+        total_rows += rows
+        total_seconds += seconds
+        print(f"{name}: {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:.0f} rows/sec)"
+              + (f", {skipped} skipped" if skipped else ""))
+    print(f"total: {total_rows} rows in {total_seconds:.2f}s "
+          f"({total_rows / total_seconds if total_seconds else 0:.0f} rows/sec)")
@@ -0,0 +1,172 @@
+"""Predict the load of every program set of every active program, ahead of the athlete opening /record.
+
+Each user's one rep max on an exercise is estimated from their sets of the exercise in the HISTORY_DAYS before their
+latest one, in the unit of that latest set. Every program set of the user's current program is then scored in one
+vectorized pass: the weight that puts the middle of the set's rep range at its RPE, rounded to the exercise's weight
+step. Exercises the user has never logged get no prediction.
+
+The features of a program set are shared through input_features, and the untouched predictions of the previous run
+are replaced. Predictions the user agreed with or corrected are kept, and their program sets are not predicted again.
+"""
+import argparse
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from base45reflex.database import create_engine, insert_new
+from base45reflex.predictions import estimate_1rm, round_to_step, weight_for_reps
+from base45reflex.reference import ReferenceData, get_reference
+from base45reflex.SQLModels import (InputFeatures, Prediction, ProgramDay, ProgramSet, UserProgramHistory, Workout,
+                                    WorkoutSet)
+from base45reflex.units import convert
+from rxconfig import config
+
+MODEL = 'e1rm-epley-v1'
+
+HISTORY_DAYS = 28
+
+USER_CHUNK = 500
+
+FEATURES = ('reps', 'reps_max', 'reps_min', 'rpe', 'set_number')
+
+
+def upcoming_sets(session: Session) -> pd.DataFrame:
+    """Every program set of every current program, one row per user and set."""
+    result = session.execute(
+        select(UserProgramHistory.user_id, ProgramSet.id.label('program_set_id'), ProgramSet.exercise_id,
+               ProgramSet.min_reps, ProgramSet.max_reps, ProgramSet.avg_rpe)
+        .join(ProgramDay, ProgramDay.program_id == UserProgramHistory.program_id)
+        .join(ProgramSet, ProgramSet.day_id == ProgramDay.id)
+        .where(UserProgramHistory.current == True)
+        .order_by(UserProgramHistory.user_id, ProgramSet.id))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def recent_sets(session: Session, user_ids: List[str]) -> pd.DataFrame:
+    """The users' sets from HISTORY_DAYS before their latest workout on."""
+    latest = session.execute(select(Workout.user_id, func.max(Workout.date))
+                             .where(Workout.user_id.in_(user_ids))
+                             .group_by(Workout.user_id)).all()
+    cutoffs = {user_id: pd.Timestamp(last) - pd.Timedelta(days=HISTORY_DAYS) for user_id, last in latest}
+    frames = []
+    for start in range(0, len(latest), USER_CHUNK):
+        chunk = [user_id for user_id, _ in latest[start:start + USER_CHUNK]]
+        # Bounded by the earliest cutoff of the chunk in the query, and by every user's own cutoff below
+        result = session.execute(
+            select(Workout.user_id, Workout.date, WorkoutSet.exercise_id, WorkoutSet.weight, WorkoutSet.reps,
+                   WorkoutSet.num_sets, WorkoutSet.avg_rpe, WorkoutSet.unit_id, WorkoutSet.id.label('set_id'))
+            .join(Workout, WorkoutSet.workout_id == Workout.id)
+            .where(Workout.user_id.in_(chunk))
+            .where(Workout.date >= min(cutoffs[user_id] for user_id in chunk).date()))
+        sets = pd.DataFrame(result.all(), columns=list(result.keys()))
+        frames.append(sets[pd.to_datetime(sets['date']) >= sets['user_id'].map(cutoffs)])
+    if not frames:
+        return pd.DataFrame(columns=['user_id', 'date', 'exercise_id', 'weight', 'reps', 'num_sets', 'avg_rpe',
+                                     'unit_id', 'set_id'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def one_rep_maxes(sets: pd.DataFrame, reference: ReferenceData) -> pd.DataFrame:
+    """The best estimated one rep max of every user and exercise in the HISTORY_DAYS before its latest set.
+
+    Estimates are in the unit of the latest set of the exercise.
+    """
+    sets = sets.sort_values(['date', 'set_id'])
+    grouped = sets.groupby(['user_id', 'exercise_id'])
+    sets = sets.assign(latest_date=grouped['date'].transform('max'), target_unit=grouped['unit_id'].transform('last'))
+    sets = sets[pd.to_datetime(sets['date']) >= pd.to_datetime(sets['latest_date']) - pd.Timedelta(days=HISTORY_DAYS)]
+    weight = convert(sets['weight'], sets['unit_id'], sets['target_unit'], reference)
+    sets = sets.assign(e1rm=estimate_1rm(weight, sets['reps'] / sets['num_sets'], sets['avg_rpe']))
+    return (sets.groupby(['user_id', 'exercise_id'])
+            .agg(e1rm=('e1rm', 'max'), unit_id=('target_unit', 'last'))
+            .reset_index())
+
+
+def score(upcoming: pd.DataFrame, maxes: pd.DataFrame, reference: ReferenceData) -> pd.DataFrame:
+    """The predicted weight of every upcoming set whose exercise the user has a one rep max for."""
+    scored = upcoming.merge(maxes, on=['user_id', 'exercise_id'], how='inner')
+    if scored.empty:
+        return scored.assign(reps=0, prediction=0.0)
+    scored['reps'] = np.round((scored['min_reps'] + scored['max_reps']) / 2).astype(int)
+    steps = scored['exercise_id'].map({exercise_id: row['weight_step']
+                                       for exercise_id, row in reference.exercises.items()})
+    weight = weight_for_reps(scored['e1rm'].to_numpy(), scored['reps'].to_numpy(), scored['avg_rpe'].to_numpy())
+    scored['prediction'] = round_to_step(weight, steps.to_numpy(dtype=float))
+    return scored[np.isfinite(scored['prediction'])]
+
+
+def feature_ids(session: Session, scored: pd.DataFrame) -> pd.Series:
+    """The input_features id of every scored set, inserting the feature rows that do not exist yet.
+
+    The database numbers the new rows, and a row another run inserted first is left alone and read back instead.
+    """
+    # A prediction is the weight of every set of its program set, so its features are those of the first set
+    features = pd.DataFrame({'reps': scored['reps'], 'reps_max': scored['max_reps'], 'reps_min': scored['min_reps'],
+                             'rpe': scored['avg_rpe'].astype(float), 'set_number': 1})
+    keys = list(features.itertuples(index=False, name=None))
+    existing = stored_features(session)
+    missing = sorted(set(keys) - set(existing))
+    if missing:
+        session.execute(insert_new(session.get_bind(), InputFeatures.__table__),
+                        [dict(zip(FEATURES, key)) for key in missing])
+        existing = stored_features(session)
+    return pd.Series([existing[key] for key in keys], index=scored.index)
+
+
+def stored_features(session: Session) -> dict:
+    """The id of every input_features row, by its features."""
+    return {tuple(row[1:]): row[0] for row in session.execute(
+        select(InputFeatures.id, *[getattr(InputFeatures, name) for name in FEATURES])).all()}
+
+
+def write_predictions(session: Session, scored: pd.DataFrame, user_ids: List[str]) -> int:
+    """Replace the users' untouched predictions of this model with the scored ones, in one transaction.
+
+    Program sets with a prediction the user agreed with or corrected keep that one and get no new prediction. Returns
+    the number of predictions stored.
+    """
+    session.execute(delete(Prediction)
+                    .where(Prediction.model == MODEL)
+                    .where(Prediction.user_id.in_(user_ids))
+                    .where(Prediction.user_agrees == False)
+                    .where(Prediction.user_suggestion.is_(None)))
+    reviewed = session.execute(select(Prediction.user_id, Prediction.program_set_id)
+                               .where(Prediction.model == MODEL)
+                               .where(Prediction.user_id.in_(user_ids))).all()
+    if reviewed:
+        keys = pd.MultiIndex.from_frame(scored[['user_id', 'program_set_id']])
+        scored = scored[~keys.isin(reviewed)]
+    if not scored.empty:
+        rows = pd.DataFrame({'input_id': feature_ids(session, scored), 'exercise': scored['exercise_id'],
+                             'model': MODEL, 'prediction': scored['prediction'], 'user_agrees': False,
+                             'user_suggestion': None, 'user_id': scored['user_id'],
+                             'program_set_id': scored['program_set_id'],
+                             'unit_id': scored['unit_id'].astype('Int64').astype(object)
+                             .where(scored['unit_id'].notna(), None)})
+        session.execute(insert(Prediction.__table__), rows.to_dict('records'))
+    session.commit()
+    return len(scored)
+
+
+def predict_loads(session: Session) -> int:
+    """Score every upcoming set of every active program and store the predictions, returns how many were stored."""
+    reference = get_reference(session)
+    upcoming = upcoming_sets(session)
+    user_ids = upcoming['user_id'].unique().tolist()
+    maxes = one_rep_maxes(recent_sets(session, user_ids), reference)
+    return write_predictions(session, score(upcoming, maxes, reference), user_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict the load of every upcoming program set.")
+    parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(create_engine(config.db_url)) as sess:
+        count = predict_loads(sess)
+    seconds = time.perf_counter() - start
+    print(f"stored {count} predictions in {seconds:.2f}s ({count / seconds if seconds else 0:.0f} sets/sec)")
@@ -0,0 +1,109 @@
+"""Project where every athlete's loads will be at the end of their current program block.
+
+The trend of each exercise is a least squares line through the user's TotalLoad metrics since the program started,
+in the unit of their latest set of the exercise, with a flat line through exercises logged on a single day. Every
+program day of the current program gets the line's value on the program's end date for each of its exercises the user
+has a trend for, so the landing page reads a day's projections with one indexed lookup.
+
+The projections of current programs are replaced on every run, those of earlier programs are kept as they were.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
+from base45reflex.database import create_engine
+from base45reflex.reference import ReferenceData, get_reference
+from base45reflex.SQLModels import (ProgramDay, ProgramSet, UserProgramHistory, UserProgramHistoryPrediction,
+                                    UserWorkoutMetrics)
+from base45reflex.units import convert
+from rxconfig import config
+
+METRIC = 'TotalLoad'
+
+TREND_KEYS = ['user_program_history_id', 'exercise_id']
+
+
+def program_exercises(session: Session) -> pd.DataFrame:
+    """Every exercise of every program day of every current program."""
+    result = session.execute(
+        select(UserProgramHistory.id.label('user_program_history_id'), ProgramDay.id.label('program_day_id'),
+               ProgramSet.exercise_id)
+        .join(ProgramDay, ProgramDay.program_id == UserProgramHistory.program_id)
+        .join(ProgramSet, ProgramSet.day_id == ProgramDay.id)
+        .where(UserProgramHistory.current == True)
+        .distinct())
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def program_metrics(session: Session, reference: ReferenceData) -> pd.DataFrame:
+    """The METRIC rows logged during every current program, with the program's dates."""
+    result = session.execute(
+        select(UserProgramHistory.id.label('user_program_history_id'), UserProgramHistory.start_date,
+               UserProgramHistory.end_date, UserWorkoutMetrics.set_id, UserWorkoutMetrics.date,
+               UserWorkoutMetrics.exercise, UserWorkoutMetrics.unit_id, UserWorkoutMetrics.value)
+        .join(UserWorkoutMetrics, UserWorkoutMetrics.user_id == UserProgramHistory.user_id)
+        .where(UserProgramHistory.current == True)
+        .where(UserWorkoutMetrics.metric == METRIC)
+        .where(UserWorkoutMetrics.date >= UserProgramHistory.start_date)
+        .where(UserWorkoutMetrics.date <= UserProgramHistory.end_date)
+        .where(UserWorkoutMetrics.unit_id.is_not(None)))
+    metrics = pd.DataFrame(result.all(), columns=list(result.keys()))
+    metrics['exercise_id'] = metrics['exercise'].map(reference.exercise_ids)
+    return metrics.dropna(subset=['exercise_id']).astype({'exercise_id': int})
+
+
+def fit_trends(metrics: pd.DataFrame, reference: ReferenceData) -> pd.DataFrame:
+    """Each program and exercise's trend evaluated at the program's end date, in the unit of its latest set."""
+    metrics = metrics.sort_values(['date', 'set_id'])
+    target_unit = metrics.groupby(TREND_KEYS)['unit_id'].transform('last')
+    metrics = metrics.assign(value=convert(metrics['value'], metrics['unit_id'], target_unit, reference),
+                             unit_id=target_unit,
+                             x=(pd.to_datetime(metrics['date']) - pd.to_datetime(metrics['start_date'])).dt.days)
+    metrics = metrics.assign(xx=metrics['x'] ** 2, xy=metrics['x'] * metrics['value'])
+    sums = metrics.groupby(TREND_KEYS).agg(n=('x', 'count'), x=('x', 'sum'), y=('value', 'sum'), xx=('xx', 'sum'),
+                                           xy=('xy', 'sum'), unit_id=('unit_id', 'last'),
+                                           start_date=('start_date', 'last'), end_date=('end_date', 'last'))
+    denominator = sums['n'] * sums['xx'] - sums['x'] ** 2
+    flat = denominator == 0
+    slope = np.where(flat, 0.0, (sums['n'] * sums['xy'] - sums['x'] * sums['y']) / np.where(flat, 1, denominator))
+    intercept = (sums['y'] - slope * sums['x']) / sums['n']
+    horizon = (pd.to_datetime(sums['end_date']) - pd.to_datetime(sums['start_date'])).dt.days
+    sums['value'] = np.maximum(np.round(intercept + slope * horizon, 2), 0)
+    return sums[['unit_id', 'value']].reset_index()
+
+
+def write_projections(session: Session, projections: pd.DataFrame):
+    """Replace the projections of every current program, in one transaction."""
+    current = select(UserProgramHistory.id).where(UserProgramHistory.current == True)
+    session.execute(delete(UserProgramHistoryPrediction)
+                    .where(UserProgramHistoryPrediction.user_program_history_id.in_(current))
+                    .execution_options(synchronize_session=False))
+    if not projections.empty:
+        session.execute(insert(UserProgramHistoryPrediction.__table__),
+                        projections.astype({'unit_id': int}).to_dict('records'))
+    session.commit()
+
+
+def project_programs(session: Session) -> int:
+    """Project the loads of every current program, returns the number of projections stored."""
+    reference = get_reference(session)
+    trends = fit_trends(program_metrics(session, reference), reference)
+    projections = program_exercises(session).merge(trends, on=TREND_KEYS, how='inner')
+    write_projections(session, projections[['user_program_history_id', 'program_day_id', 'exercise_id', 'unit_id',
+                                            'value']])
+    return len(projections)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Project the end of block loads of every current program.")
+    parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(create_engine(config.db_url)) as sess:
+        count = project_programs(sess)
+    seconds = time.perf_counter() - start
+    print(f"stored {count} projections in {seconds:.2f}s")
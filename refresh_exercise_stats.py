@@ -0,0 +1,22 @@
+"""Refresh exercise_rep_range_stats, the rep range popularity on the exercise page, from program_sets.
+
+Run it on a schedule or after programs are written; the exercise page only reads the table.
+"""
+import argparse
+import time
+
+from sqlmodel import Session
+
+from base45reflex import exercise_stats
+from base45reflex.database import create_engine
+from rxconfig import config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the rep range popularity of every exercise.")
+    parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(create_engine(config.db_url)) as sess:
+        count = exercise_stats.refresh(sess)
+    seconds = time.perf_counter() - start
+    print(f"stored {count} rep ranges in {seconds:.2f}s")
@@ -1,7 +1,25 @@
+import os
+
 import reflex as rx
 
 ENVIRONMENT = 'DEV'
 
+# Leave vars whose value did not change out of the state deltas sent to the browser
+SLIM_DELTAS = True
+# Log the size of every state delta and keep totals per var, see base45reflex.deltas.report
+MEASURE_DELTAS = ENVIRONMENT == 'DEV'
+
+# Engine settings for the app and calculate_metrics, see base45reflex.database
+DB_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_recycle': 3600,
+}
+
 
 class BasereflexConfig(rx.Config):
     pass
@@ -10,11 +28,11 @@ class BasereflexConfig(rx.Config):
 if not ENVIRONMENT == 'DEV':
     config = BasereflexConfig(
         app_name="base45reflex",
-        db_url="sqlite:///reflex.db",
+        db_url=os.environ.get("DATABASE_URL", "sqlite:///reflex.db"),
     )
 
 else:
     config = BasereflexConfig(
         app_name="base45reflex",
-        db_url="sqlite:///reflex_dev.db",
+        db_url=os.environ.get("DATABASE_URL", "sqlite:///reflex_dev.db"),
     )
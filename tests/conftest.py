@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, create_engine
+
+from base45reflex import database, reference
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """An empty SQLite database file, seeded by the tests with tests.seed."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_reference():
+    """Every test reads the reference tables of its own database."""
+    reference.invalidate()
+    yield
+    reference.invalidate()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def async_database(engine, monkeypatch):
+    """Points database.async_session() at the test database."""
+    monkeypatch.setattr(database.config, 'db_url', str(engine.url))
+    monkeypatch.setattr(database, '_async_engine', None)
+    yield
+    if database._async_engine is not None:
+        asyncio.run(database._async_engine.dispose())
+
+
+@pytest.fixture
+def statements(engine):
+    """The SQL statements the engine runs, cleared by the tests right before the call they count."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
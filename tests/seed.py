@@ -0,0 +1,81 @@
+"""Generated training data for the tests and benchmarks.
+
+Every athlete follows the same two day program from START, one workout per program day a week, and logs one set of
+every exercise of the day. Odd numbered athletes switch from lbs to kg after their fifth week.
+"""
+import datetime
+import random
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel
+
+from base45reflex.SQLModels import (Exercise, ExerciseType, Program, ProgramDay, ProgramSet, UnitConversion, UnitType,
+                                    User, UserClients, UserProgramHistory, Workout, WorkoutSet)
+
+START = datetime.date(2026, 1, 1)
+
+EXERCISES = ('Squat', 'Bench', 'Deadlift', 'Row')
+
+COACH_ID = 'coach'
+
+
+def athlete_id(number: int) -> str:
+    return f'u{number}'
+
+
+def seed_reference(session: Session):
+    """The exercises, units and the program every athlete follows."""
+    session.add(ExerciseType(id=1, name=1))
+    session.add(UnitType(id=1, name='lbs'))
+    session.add(UnitType(id=2, name='kg'))
+    session.add(UnitType(id=3, name='g'))
+    session.add(UnitConversion(id=1, first_unit=2, second_unit=1, factor=2.20462))
+    session.add(UnitConversion(id=2, first_unit=2, second_unit=3, factor=1000))
+    for exercise_id, name in enumerate(EXERCISES, 1):
+        session.add(Exercise(id=exercise_id, name=name, weight_step=5 if name == 'Row' else 2.5, type=1))
+    session.add(User(id=COACH_ID, first_name='Coach', last_name='Coach', gender='x', role='coach',
+                     date_of_birth=datetime.date(1990, 1, 1)))
+    session.add(Program(id=1, author=COACH_ID, name='Program', length_in_weeks=8, public=True))
+    for day in (1, 2):
+        session.add(ProgramDay(id=day, program_id=1, name=f'Day {day}'))
+        for order, exercise_id in enumerate(day_exercises(day), 1):
+            session.add(ProgramSet(day_id=day, exercise_order=order, exercise_id=exercise_id, min_reps=5, max_reps=8,
+                                   avg_rpe=8, num_sets=3, myoreps=False, amrap=False))
+
+
+def day_exercises(day: int):
+    return (1, 2) if day == 1 else (3, 4)
+
+
+def seed_athlete(session: Session, number: int, weeks: int, start: datetime.date = START, rng=None):
+    """An athlete on the program from start with weeks of logged workouts."""
+    rng = rng or random.Random(number)
+    user_id = athlete_id(number)
+    session.add(User(id=user_id, first_name='Athlete', last_name=str(number), gender='x', role='athlete',
+                     date_of_birth=datetime.date(1990, 1, 1)))
+    session.add(UserProgramHistory(user_id=user_id, current=True, program_id=1, start_date=start,
+                                   end_date=start + datetime.timedelta(weeks=max(weeks, 8))))
+    for week in range(weeks):
+        for day in (1, 2):
+            workout = Workout(complete=True, date=start + datetime.timedelta(weeks=week, days=day), deload=False,
+                              program_day=day, type='strength', user_id=user_id)
+            session.add(workout)
+            session.flush()
+            for order, exercise_id in enumerate(day_exercises(day), 1):
+                session.add(WorkoutSet(workout_id=workout.id, exercise_id=exercise_id, reps=rng.randint(15, 24),
+                                       avg_rpe=rng.choice([7, 7.5, 8, 8.5]), num_sets=3, set_order=order,
+                                       weight=100 + week * 2.5 + rng.random() * 5,
+                                       unit_id=2 if number % 2 and week >= 5 else 1))
+
+
+def seed(engine: Engine, athletes: int = 3, weeks: int = 20, clients: int = 0) -> Engine:
+    """Create the schema and fill it, the coach has the first clients athletes as clients."""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_reference(session)
+        for number in range(athletes):
+            seed_athlete(session, number, weeks)
+        for number in range(clients):
+            session.add(UserClients(user_id=COACH_ID, client_id=athlete_id(number)))
+        session.commit()
+    return engine
@@ -0,0 +1,157 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlmodel import delete, select
+
+import calculate_metrics
+from base45reflex import analytics
+from base45reflex.reference import get_reference
+from base45reflex.SQLModels import User, UserWorkoutMetrics, Workout, WorkoutSet
+from base45reflex.units import convert
+from tests.seed import START, athlete_id, seed
+
+FIRST = pd.Timestamp(START)
+
+
+def daily(loads: dict, first: pd.Timestamp = FIRST) -> pd.DataFrame:
+    """Daily loads of one user from {exercise: {day after first: load}}."""
+    rows = [{'user_id': 'u0', 'exercise': exercise, 'date': first + pd.Timedelta(days=day), 'load': load,
+             'unit_id': 1} for exercise, days in loads.items() for day, load in days.items()]
+    days = pd.DataFrame(rows).sort_values('date', ignore_index=True)
+    return days.assign(set_id=days.index + 1)
+
+
+def by_metric(rows: pd.DataFrame) -> dict:
+    return {(row.exercise, pd.Timestamp(row.date), row.metric): row.value for row in rows.itertuples()}
+
+
+def calendar_analytics(days: pd.DataFrame) -> dict:
+    """The day analytics from the loads reindexed onto every calendar day, rest days filled with zero."""
+    expected = {}
+    for exercise, group in days.groupby('exercise'):
+        loads = group.set_index('date')['load']
+        first = loads.index.min()
+        calendar = pd.date_range(first - pd.Timedelta(days=analytics.CHRONIC_DAYS - 1), loads.index.max())
+        every_day = loads.reindex(calendar, fill_value=0.0)
+        acute = every_day.rolling(analytics.ACUTE_DAYS).sum()
+        chronic = every_day.rolling(analytics.CHRONIC_DAYS).sum()
+        week = every_day.rolling(analytics.ACUTE_DAYS)
+        monotony = week.mean() / week.std()
+        for date in loads.index:
+            if (date - first).days >= analytics.CHRONIC_DAYS - 1:
+                expected[(exercise, date, 'ACWR')] = ((acute[date] / analytics.ACUTE_DAYS)
+                                                      / (chronic[date] / analytics.CHRONIC_DAYS))
+            expected[(exercise, date, 'Monotony')] = monotony[date]
+            expected[(exercise, date, 'Strain')] = acute[date] * monotony[date]
+    return expected
+
+
+def test_day_analytics_match_a_calendar_computation():
+    rng = np.random.default_rng(0)
+    loads = {}
+    for exercise, first_day in (('Squat', 0), ('Bench', 20)):
+        days = first_day + np.cumsum(rng.integers(1, 6, size=40))
+        loads[exercise] = dict(zip(days.tolist(), rng.uniform(50, 150, size=40).tolist()))
+    days = daily(loads)
+
+    actual = by_metric(analytics.day_analytics(days))
+
+    expected = calendar_analytics(days)
+    assert set(actual) == set(expected)
+    assert [actual[key] for key in expected] == pytest.approx(list(expected.values()))
+
+
+def test_acwr_needs_chronic_days_of_history():
+    cutoff = analytics.CHRONIC_DAYS - 1
+    days = daily({'Squat': {0: 100, cutoff - 1: 100}, 'Bench': {0: 100, cutoff: 100}})
+
+    acwr = {key: value for key, value in by_metric(analytics.day_analytics(days)).items() if key[2] == 'ACWR'}
+    assert list(acwr) == [('Bench', FIRST + pd.Timedelta(days=cutoff), 'ACWR')]
+
+    # A first training day before the loads counts towards the history
+    first_dates = pd.DataFrame({'user_id': ['u0'], 'exercise': ['Squat'],
+                                'first_date': [START - datetime.timedelta(days=1)]})
+    rows = by_metric(analytics.day_analytics(days, first_dates))
+    assert ('Squat', FIRST + pd.Timedelta(days=cutoff - 1), 'ACWR') in rows
+
+
+def test_rest_days_count_as_zero_load():
+    last = analytics.CHRONIC_DAYS - 1
+    days = daily({'Squat': {0: 100, 6: 100, last: 100}})
+
+    rows = by_metric(analytics.day_analytics(days))
+
+    week = np.array([100, 0, 0, 0, 0, 0, 100])
+    monotony = week.mean() / week.std(ddof=1)
+    assert rows[('Squat', FIRST + pd.Timedelta(days=6), 'Monotony')] == pytest.approx(monotony)
+    assert rows[('Squat', FIRST + pd.Timedelta(days=6), 'Strain')] == pytest.approx(200 * monotony)
+    first_week = np.array([0, 0, 0, 0, 0, 0, 100])
+    assert rows[('Squat', FIRST, 'Monotony')] == pytest.approx(first_week.mean() / first_week.std(ddof=1))
+    assert rows[('Squat', FIRST + pd.Timedelta(days=last), 'ACWR')] == pytest.approx((100 / 7) / (300 / 28))
+
+
+def test_e1rm_of_every_set_with_an_rpe():
+    sets = pd.DataFrame({'set_id': [1, 2], 'date': [START, START], 'exercise': ['Squat', 'Squat'], 'unit_id': [1, 1],
+                         'user_id': ['u0', 'u0'], 'weight': [100.0, 100.0], 'reps': [15, 15], 'num_sets': [3, 3],
+                         'avg_rpe': [8.0, None]})
+
+    rows = analytics.set_analytics(sets)
+
+    assert rows['set_id'].tolist() == [1]
+    assert rows['value'].tolist() == pytest.approx([100 * (1 + (5 + 10 - 8) / 30)])
+
+
+def test_daily_loads_add_up_in_the_unit_of_the_latest_set(engine, session):
+    seed(engine, athletes=0, weeks=0)
+    sets = pd.DataFrame({'set_id': [1, 2, 3], 'date': [START, START, START + datetime.timedelta(days=1)],
+                         'exercise': 'Squat', 'user_id': 'u0', 'weight': [100.0, 50.0, 60.0], 'num_sets': [2, 1, 1],
+                         'unit_id': [1, 1, 2]})
+
+    days = analytics.daily_loads(sets, get_reference(session))
+
+    assert days['unit_id'].tolist() == [2, 2]
+    assert days['set_id'].tolist() == [2, 3]
+    assert days['load'].tolist() == pytest.approx([250 / 2.20462, 60])
+
+
+def day_rows(session) -> pd.DataFrame:
+    columns = ['set_id', 'metric', 'date', 'exercise', 'unit_id', 'value']
+    rows = session.exec(select(*[getattr(UserWorkoutMetrics, column) for column in columns])
+                        .where(UserWorkoutMetrics.metric.in_(analytics.DAY_ANALYTICS))).all()
+    return pd.DataFrame(rows, columns=columns).sort_values(['set_id', 'metric'], ignore_index=True)
+
+
+def test_incremental_day_analytics_match_a_full_run(engine, session):
+    seed(engine, athletes=2, weeks=12)
+    sets = [workout_set.dict() for workout_set in session.exec(select(WorkoutSet)).all()]
+    dates = dict(session.exec(select(Workout.id, Workout.date)).all())
+    session.exec(delete(WorkoutSet))
+    session.commit()
+    # Calculated in three runs, each starting inside the windows of the days before it
+    for first_week, last_week in ((0, 3), (3, 7), (7, 12)):
+        weeks = (START + datetime.timedelta(weeks=first_week), START + datetime.timedelta(weeks=last_week))
+        session.add_all([WorkoutSet(**row) for row in sets if weeks[0] <= dates[row['workout_id']] < weeks[1]])
+        session.commit()
+        for number in range(2):
+            calculate_metrics.calculate_metrics(session.get(User, athlete_id(number)), session)
+    # A set added to a calculated day becomes its last set, the day's rows move over to it
+    last_day = max(sets, key=lambda row: row['id'])
+    late_set = WorkoutSet(**{**last_day, 'id': None, 'set_order': 9})
+    session.add(late_set)
+    session.commit()
+    calculate_metrics.calculate_metrics(session.get(User, athlete_id(1)), session)
+    incremental = day_rows(session)
+
+    for number in range(2):
+        calculate_metrics.calculate_metrics(session.get(User, athlete_id(number)), session, full=True)
+    full = day_rows(session)
+
+    assert late_set.id in incremental['set_id'].tolist()
+    assert last_day['id'] not in incremental['set_id'].tolist()
+    keys = ['set_id', 'metric', 'date', 'exercise']
+    assert incremental[keys].equals(full[keys])
+    # Strain rows written before the second athlete's switch to kg stay in lbs until a full run re-bases them
+    value = convert(incremental['value'], incremental['unit_id'], full['unit_id'], get_reference(session))
+    assert value.to_numpy() == pytest.approx(full['value'].to_numpy())
@@ -0,0 +1,91 @@
+import asyncio
+import types
+from collections import OrderedDict
+
+import pytest
+
+from base45reflex import auth
+from base45reflex.state import State
+from tests.seed import athlete_id, seed
+
+
+class FakeFirebase:
+    """Stands in for the pyrebase auth client, accepting every token of TOKENS."""
+    TOKENS = {'token-a': athlete_id(0), 'token-b': athlete_id(1), 'token-c': athlete_id(0)}
+
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh(self, refresh_token: str) -> dict:
+        self.refreshed.append(refresh_token)
+        return {'userId': self.TOKENS[refresh_token]}
+
+
+@pytest.fixture
+def firebase(engine, async_database, monkeypatch):
+    seed(engine, athletes=2, weeks=0)
+    fake = FakeFirebase()
+    monkeypatch.setattr(auth, 'get_auth', lambda: fake)
+    monkeypatch.setattr(auth, '_verified', OrderedDict())
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The auth module's monotonic clock, moved forward by the tests."""
+    now = [1000.0]
+    monkeypatch.setattr(auth, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def check(refresh_token: str) -> dict:
+    """The user State.refresh logs in with the refresh token."""
+    state = types.SimpleNamespace(refresh_token=refresh_token, user=None)
+    asyncio.run(State.refresh.fn(state))
+    return state.user
+
+
+def test_verified_tokens_skip_firebase_until_they_expire(firebase, clock):
+    assert check('token-a')['id'] == athlete_id(0)
+    clock[0] += auth.TOKEN_TTL - 1
+    assert check('token-a')['id'] == athlete_id(0)
+    assert firebase.refreshed == ['token-a']
+
+    clock[0] += 1
+    assert check('token-a')['id'] == athlete_id(0)
+    assert firebase.refreshed == ['token-a', 'token-a']
+
+
+def test_least_recently_used_tokens_are_dropped(firebase, clock, monkeypatch):
+    monkeypatch.setattr(auth, 'MAX_TOKENS', 2)
+    check('token-a')
+    check('token-b')
+    check('token-a')
+    check('token-c')
+
+    assert auth.verified_user('token-a') is not None
+    assert auth.verified_user('token-b') is None
+    assert auth.verified_user('token-c') is not None
+
+
+def test_revoke_forgets_one_token(firebase, clock):
+    check('token-a')
+    check('token-c')
+
+    auth.revoke('token-a')
+
+    assert auth.verified_user('token-a') is None
+    assert auth.verified_user('token-c') is not None
+    check('token-a')
+    assert firebase.refreshed == ['token-a', 'token-c', 'token-a']
+
+
+def test_revoke_user_forgets_every_token_of_the_user(firebase, clock):
+    for token in ('token-a', 'token-b', 'token-c'):
+        check(token)
+
+    auth.revoke_user(athlete_id(0))
+
+    assert auth.verified_user('token-a') is None
+    assert auth.verified_user('token-c') is None
+    assert auth.verified_user('token-b')['id'] == athlete_id(1)
@@ -0,0 +1,67 @@
+import datetime
+
+import pandas as pd
+import pytest
+from sqlmodel import Session, create_engine, delete, select
+
+import calculate_metrics
+from base45reflex.SQLModels import (User, UserIndicatorPayload, UserMetricSummary, UserMetricsWatermark,
+                                    UserWorkoutMetrics, Workout, WorkoutSet)
+from tests.seed import START, seed
+
+SUMMARY = ['user_id', 'user_program_history_id', 'program_day_id', 'exercise', 'metric', 'unit_id', 'latest', 'prev',
+           'count', 'mean', 'm2', 'latest_set_id']
+
+
+def summary(session) -> pd.DataFrame:
+    rows = session.exec(select(*[getattr(UserMetricSummary, column) for column in SUMMARY])).all()
+    return pd.DataFrame(rows, columns=SUMMARY).sort_values(SUMMARY[:5], ignore_index=True)
+
+
+def calculate_everyone(session, full: bool = False):
+    for user in session.exec(select(User)).all():
+        calculate_metrics.calculate_metrics(user, session, full=full)
+
+
+def test_incremental_summary_matches_full_across_a_unit_change(engine, session):
+    # The second athlete switches from lbs to kg in week 5, after the first run
+    seed(engine, athletes=2, weeks=10)
+    later = session.exec(select(WorkoutSet).join(Workout)
+                         .where(Workout.date >= START + datetime.timedelta(weeks=3))).all()
+    later = [workout_set.dict() for workout_set in later]
+    session.exec(delete(WorkoutSet).where(WorkoutSet.id.in_([row['id'] for row in later])))
+    session.commit()
+    calculate_everyone(session)
+    session.add_all([WorkoutSet(**row) for row in later])
+    session.commit()
+    calculate_everyone(session)
+    incremental = summary(session)
+
+    calculate_everyone(session, full=True)
+    full = summary(session)
+
+    assert incremental[SUMMARY[:6]].equals(full[SUMMARY[:6]])
+    for column in ('latest', 'prev', 'count', 'mean', 'm2'):
+        assert incremental[column].to_numpy(dtype=float) == pytest.approx(full[column].to_numpy(dtype=float))
+
+
+def table_rows(engine, model) -> list:
+    """The table's rows without their ids and the time they were written, sorted."""
+    columns = [column for column in model.__table__.columns if column.name not in ('id', 'updated')]
+    with engine.connect() as connection:
+        return sorted(connection.execute(select(*columns)).all(), key=repr)
+
+
+def test_backfill_matches_a_serial_run(engine, session, tmp_path):
+    seed(engine, athletes=5, weeks=8)
+    calculate_everyone(session)
+    parallel = seed(create_engine(f"sqlite:///{tmp_path / 'parallel.db'}"), athletes=5, weeks=8)
+    with Session(parallel) as parallel_session:
+        user_ids = parallel_session.exec(select(User.id)).all()
+
+    stats = calculate_metrics.backfill(str(parallel.url), user_ids, workers=2)
+
+    assert sum(worker['users'] for worker in stats.values()) == len(user_ids)
+    for model in (UserWorkoutMetrics, UserMetricSummary, UserIndicatorPayload, UserMetricsWatermark):
+        assert table_rows(parallel, model) == table_rows(engine, model)
+    parallel.dispose()
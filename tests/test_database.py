@@ -0,0 +1,77 @@
+import asyncio
+import datetime
+import types
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import SQLModel, delete
+
+import calculate_metrics
+from base45reflex import database
+from base45reflex.pages import index
+from base45reflex.pages.index import LandingState, day_indicators
+from base45reflex.SQLModels import User, UserIndicatorPayload, UserMetricSummary, UserWorkoutMetrics
+from tests.seed import START, athlete_id, seed
+
+
+class PostgresBind:
+    """Stands in for a Postgres engine where only the dialect is looked at."""
+    dialect = postgresql.dialect()
+
+
+def test_load_day_reads_the_history_on_the_async_session(engine, session, async_database, monkeypatch):
+    seed(engine, athletes=1, weeks=4)
+    calculate_metrics.calculate_metrics(session.get(User, athlete_id(0)), session)
+    # Without payload or summary rows the day is rendered from the metric history, bound by the start date
+    session.exec(delete(UserIndicatorPayload))
+    session.exec(delete(UserMetricSummary))
+    session.commit()
+    expected = day_indicators(session, athlete_id(0), 1, START)
+    start_dates = []
+
+    def recording_day_indicators(sync_session, user_id, program_day_id, start_date):
+        start_dates.append(start_date)
+        return day_indicators(sync_session, user_id, program_day_id, start_date)
+
+    monkeypatch.setattr(index, 'day_indicators', recording_day_indicators)
+    state = types.SimpleNamespace(user={'id': athlete_id(0)}, day_indicators={}, program_start_date=START.isoformat(),
+                                  user_program=[{'id': 1, 'name': 'Day 1'}])
+
+    asyncio.run(LandingState.load_day.fn(state, 'Day 1'))
+
+    assert state.day_indicators == {'Day 1': expected}
+    assert start_dates == [START] and type(start_dates[0]) is datetime.date
+
+
+def test_postgres_urls_get_a_pooled_psycopg2_engine():
+    pytest.importorskip('psycopg2')
+    engine = database.create_engine('postgresql://base45@localhost/base45')
+
+    assert engine.dialect.driver == 'psycopg2'
+    assert engine.pool.size() == database.DB_PROFILE['pool_size']
+
+
+def test_postgres_urls_get_an_asyncpg_engine():
+    pytest.importorskip('asyncpg')
+    engine = database.create_async_engine('postgresql://base45@localhost/base45')
+
+    assert engine.dialect.driver == 'asyncpg'
+    assert engine.pool.size() == database.DB_PROFILE['pool_size']
+
+
+@pytest.mark.parametrize('table', sorted(SQLModel.metadata.tables))
+def test_schema_compiles_for_postgres(table):
+    table = SQLModel.metadata.tables[table]
+
+    assert str(CreateTable(table).compile(dialect=postgresql.dialect()))
+    for index in table.indexes:
+        assert str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+
+
+def test_upserts_compile_for_postgres():
+    metrics = str(calculate_metrics.upsert_metrics_statement(PostgresBind).compile(dialect=postgresql.dialect()))
+    new = str(database.insert_new(PostgresBind, UserWorkoutMetrics.__table__).compile(dialect=postgresql.dialect()))
+
+    assert 'ON CONFLICT (set_id, metric) DO UPDATE SET' in metrics
+    assert new.endswith('ON CONFLICT DO NOTHING')
@@ -0,0 +1,23 @@
+from collections import defaultdict
+
+from base45reflex import deltas
+
+
+def test_slim_drops_vars_the_client_already_has():
+    sent = {}
+    deltas.slim({'state': {'user': {'id': 'u0'}, 'count': 1}}, sent)
+    delta = {'state': {'user': {'id': 'u0'}, 'count': 2}}
+
+    deltas.slim(delta, sent)
+
+    assert delta == {'state': {'count': 2}}
+
+
+def test_measure_logs_every_event_and_totals_the_vars(monkeypatch, capsys):
+    monkeypatch.setattr(deltas, '_sent_bytes', defaultdict(lambda: [0, 0]))
+
+    deltas.measure('state.load_day', {'state': {'rows': [1, 2, 3], 'name': 'x'}})
+    deltas.measure('state.load_day', {'state': {'rows': [1, 2, 3]}})
+
+    assert 'state.load_day delta 12 bytes' in capsys.readouterr().out
+    assert deltas.report() == [('state.rows', 2, 18), ('state.name', 1, 3)]
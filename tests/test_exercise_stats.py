@@ -0,0 +1,29 @@
+from sqlmodel import select
+
+from base45reflex import exercise_stats
+from base45reflex.SQLModels import Program, ProgramSet
+from tests.seed import COACH_ID, seed
+
+
+def rep_ranges(session) -> dict:
+    return {(row.exercise_id, row.min_reps, row.max_reps): (row.count, row.percent)
+            for row in exercise_stats.rep_range_stats(session)}
+
+
+def test_refresh_follows_edited_rep_ranges(engine, session):
+    seed(engine, athletes=0)
+    session.add(Program(id=2, author=COACH_ID, name='Other', length_in_weeks=4, public=True))
+    session.commit()
+
+    assert exercise_stats.refresh(session) == 4
+    assert rep_ranges(session) == {(exercise_id, 5, 8): (1, 50.0) for exercise_id in (1, 2, 3, 4)}
+
+    squat = session.exec(select(ProgramSet).where(ProgramSet.exercise_id == 1)).one()
+    squat.min_reps, squat.max_reps = 3, 5
+    session.add(squat)
+    session.commit()
+    exercise_stats.refresh(session)
+    # A second refresh upserts into the rows the first one wrote
+    exercise_stats.refresh(session)
+
+    assert rep_ranges(session) == {(1, 3, 5): (1, 50.0), **{(exercise_id, 5, 8): (1, 50.0) for exercise_id in (2, 3, 4)}}
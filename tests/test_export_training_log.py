@@ -0,0 +1,120 @@
+import glob
+import os
+
+import pytest
+from sqlmodel import select
+
+import calculate_metrics
+from base45reflex.SQLModels import User, Workout, WorkoutSet
+from tests.seed import athlete_id, seed
+
+pytest.importorskip('pyarrow')
+import export_training_log  # noqa: E402
+
+ATHLETES = 3
+
+
+def calculate(session):
+    for number in range(ATHLETES):
+        calculate_metrics.calculate_metrics(session.get(User, athlete_id(number)), session)
+
+
+def add_set(session, user_id: str) -> int:
+    """Log one more set in the user's last workout, returns its id."""
+    workout = session.exec(select(Workout).where(Workout.user_id == user_id).order_by(Workout.id.desc())).first()
+    workout_set = WorkoutSet(workout_id=workout.id, exercise_id=1, reps=5, avg_rpe=8, num_sets=1, set_order=9,
+                             weight=120, unit_id=1)
+    session.add(workout_set)
+    session.commit()
+    return workout_set.id
+
+
+def exported_files(root: str) -> list:
+    return sorted(glob.glob(os.path.join(root, 'user_id=*', 'month=*', 'part-*')))
+
+
+def exported_rows(root: str):
+    return export_training_log.open_dataset(root).to_table().to_pandas()
+
+
+@pytest.fixture(params=list(export_training_log.EXTENSIONS))
+def file_format(request):
+    return request.param
+
+
+def test_export_matches_the_database(engine, session, tmp_path, file_format):
+    seed(engine, athletes=ATHLETES, weeks=6)
+    calculate(session)
+    root = str(tmp_path / 'export')
+    set_ids = session.exec(select(WorkoutSet.id, Workout.user_id).join(Workout)).all()
+
+    assert export_training_log.export(str(engine.url), root, file_format=file_format) == len(set_ids)
+
+    dataset = export_training_log.open_dataset(root)
+    assert dataset.count_rows() == len(set_ids)
+    rows = exported_rows(root)
+    assert sorted(zip(rows['set_id'], rows['user_id'])) == sorted(set_ids)
+    assert rows[list(export_training_log.METRICS)].notna().all().all()
+    assert all(path.endswith(f'.{file_format}') for path in exported_files(root))
+
+
+def test_rerun_appends_only_new_sets(engine, session, tmp_path, file_format):
+    seed(engine, athletes=ATHLETES, weeks=6)
+    calculate(session)
+    root = str(tmp_path / 'export')
+    exported = export_training_log.export(str(engine.url), root, file_format=file_format)
+    files = exported_files(root)
+
+    assert export_training_log.export(str(engine.url), root, file_format=file_format) == 0
+    assert exported_files(root) == files
+
+    new_set = add_set(session, athlete_id(0))
+    calculate(session)
+
+    assert export_training_log.export(str(engine.url), root, file_format=file_format) == 1
+    assert len(exported_files(root)) == len(files) + 1
+    rows = exported_rows(root)
+    assert len(rows) == exported + 1
+    assert rows.loc[rows['set_id'] == new_set, 'user_id'].tolist() == [athlete_id(0)]
+
+
+def test_sets_above_the_watermark_wait_for_their_metrics(engine, session, tmp_path, file_format):
+    seed(engine, athletes=ATHLETES, weeks=6)
+    calculate(session)
+    exported = export_training_log.export(str(engine.url), str(tmp_path / 'export'), file_format=file_format)
+    new_set = add_set(session, athlete_id(0))
+
+    assert export_training_log.export(str(engine.url), str(tmp_path / 'export'), file_format=file_format) == 0
+    assert new_set not in exported_rows(str(tmp_path / 'export'))['set_id'].tolist()
+
+    all_sets = str(tmp_path / 'all_sets')
+    assert export_training_log.export(str(engine.url), all_sets, file_format=file_format,
+                                      all_sets=True) == exported + 1
+    rows = exported_rows(all_sets)
+    new_row = rows[rows['set_id'] == new_set]
+    assert len(new_row) == 1
+    assert new_row[list(export_training_log.METRICS)].isna().all().all()
+    assert rows.loc[rows['set_id'] != new_set, list(export_training_log.METRICS)].notna().all().all()
+
+
+def test_a_small_chunk_size_writes_the_same_rows(engine, session, tmp_path, file_format):
+    seed(engine, athletes=ATHLETES, weeks=6)
+    calculate(session)
+    whole, chunked = str(tmp_path / 'whole'), str(tmp_path / 'chunked')
+    export_training_log.export(str(engine.url), whole, file_format=file_format)
+
+    export_training_log.export(str(engine.url), chunked, file_format=file_format, chunk_size=5)
+
+    columns = ['user_id', *export_training_log.SCHEMA.names]
+    expected = exported_rows(whole)[columns].sort_values('set_id').reset_index(drop=True)
+    actual = exported_rows(chunked)[columns].sort_values('set_id').reset_index(drop=True)
+    assert actual.astype(str).equals(expected.astype(str))
+
+
+def test_a_root_keeps_its_format(engine, session, tmp_path):
+    seed(engine, athletes=1, weeks=1)
+    calculate_metrics.calculate_metrics(session.get(User, athlete_id(0)), session)
+    export_training_log.export(str(engine.url), str(tmp_path), file_format='parquet')
+
+    with pytest.raises(ValueError):
+        export_training_log.export(str(engine.url), str(tmp_path), file_format='arrow')
@@ -0,0 +1,80 @@
+import datetime
+import re
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import select
+
+import calculate_metrics
+from base45reflex import queries
+from base45reflex.pages.index import day_indicators, history_metrics
+from base45reflex.pages.workout import workout_details
+from base45reflex.SQLModels import User, Workout
+from tests.seed import COACH_ID, START, athlete_id, seed
+
+# The hot lookups and the index each of them has to search
+LOOKUPS = {
+    'pending_sets': (lambda session, workout_id: calculate_metrics.load_pending_sets(session, athlete_id(1), 0),
+                     ['ix_workouts_user_id_date_id', 'ix_workout_sets_workout_id',
+                      'ix_user_program_history_user_id_current']),
+    'current_program': (lambda session, workout_id: queries.current_program(session, athlete_id(1)),
+                        ['ix_user_program_history_user_id_current']),
+    'history_metrics': (lambda session, workout_id: history_metrics(session, athlete_id(1), START, 1),
+                        ['ix_workouts_user_id_date_id', 'ix_workout_sets_workout_id',
+                         'ix_user_workout_metrics_set_id_metric']),
+    'day_indicators': (lambda session, workout_id: day_indicators(session, athlete_id(1), 1, START),
+                       ['ix_user_indicator_payloads_user_id_user_program_history_id',
+                        'ix_user_program_history_user_id_current']),
+    'workout_details': (lambda session, workout_id: workout_details(session, workout_id),
+                        ['ix_workouts_user_id_date_id', 'ix_workout_sets_workout_id',
+                         'ix_user_workout_metrics_set_id_metric']),
+    'workout_history_page': (lambda session, workout_id: queries.workout_history_page(session, athlete_id(1),
+                                                                                      (END, workout_id)),
+                             ['ix_workouts_user_id_date_id']),
+    'client_workouts_page': (lambda session, workout_id: queries.client_workouts_page(session, COACH_ID,
+                                                                                      (END, workout_id)),
+                             ['ix_workouts_user_id_date_id', 'ix_user_clients_user_id_client_id']),
+    'can_view_workout': (lambda session, workout_id: queries.can_view_workout(session, COACH_ID, workout_id),
+                         ['ix_user_clients_user_id_client_id']),
+}
+
+# The history pages start from a cursor past every seeded workout
+END = START + datetime.timedelta(weeks=10)
+
+# The lookups that read their rows in index order, without sorting them
+INDEX_ORDERED = ('workout_history_page',)
+
+
+def query_plans(session, executed) -> list:
+    """The EXPLAIN QUERY PLAN steps of the executed SELECT statements."""
+    connection = session.connection()
+    return [row[-1] for statement, parameters in executed if statement.lstrip().upper().startswith('SELECT')
+            for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()]
+
+
+@pytest.mark.parametrize('lookup', LOOKUPS)
+def test_lookups_search_their_indexes(engine, session, lookup):
+    seed(engine, athletes=3, weeks=10, clients=2)
+    for number in range(3):
+        calculate_metrics.calculate_metrics(session.get(User, athlete_id(number)), session)
+    workout_id = session.exec(select(Workout.id).where(Workout.user_id == athlete_id(1))).first()
+    session.expunge_all()
+    call, indexes = LOOKUPS[lookup]
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        call(session, workout_id)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    plans = query_plans(session, executed)
+
+    assert [step for step in plans if re.match(r'SCAN (?!CONSTANT ROW)', step)] == []
+    for index in indexes:
+        assert any(step.startswith('SEARCH') and f'INDEX {index} ' in step for step in plans), (index, plans)
+    if lookup in INDEX_ORDERED:
+        assert not any(step.startswith('USE TEMP B-TREE') for step in plans), plans
@@ -0,0 +1,81 @@
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlmodel import SQLModel, create_engine, func, select
+
+import calculate_metrics
+import init_db
+from base45reflex.SQLModels import User, UserWorkoutMetrics, Workout, WorkoutSet
+from tests.seed import athlete_id, seed
+
+
+def row_counts(engine) -> dict:
+    with engine.connect() as connection:
+        return {name: connection.execute(select(func.count()).select_from(table)).scalar_one()
+                for name, table in SQLModel.metadata.tables.items()}
+
+
+def test_copy_leaves_out_the_derived_tables(engine, session, tmp_path):
+    seed(engine, athletes=2, weeks=4)
+    for user in session.exec(select(User)).all():
+        calculate_metrics.calculate_metrics(user, session)
+    target = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    SQLModel.metadata.create_all(target)
+
+    init_db.copy_database(str(engine.url), str(target.url))
+
+    source, copied = row_counts(engine), row_counts(target)
+    assert all(source[table] for table in ('user_workout_metrics', 'user_metrics_watermark', 'user_metric_summary',
+                                           'user_indicator_payloads'))
+    assert all(copied[table] == 0 for table in init_db.DERIVED_TABLES)
+    assert copied[Workout.__tablename__] == source[Workout.__tablename__]
+    assert copied[WorkoutSet.__tablename__] == source[WorkoutSet.__tablename__]
+    target.dispose()
+
+
+def test_upsert_falls_back_to_the_unique_index_a_row_clashes_on(engine, session, tmp_path):
+    seed(engine, athletes=1, weeks=4)
+    calculate_metrics.calculate_metrics(session.get(User, athlete_id(0)), session)
+    target = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    SQLModel.metadata.create_all(target)
+    exclude = ('user_metrics_watermark', 'user_metric_summary', 'user_indicator_payloads')
+    init_db.copy_database(str(engine.url), str(target.url), exclude=exclude)
+    with target.begin() as connection:
+        # The target's metrics got other ids, the same rows clash on (set_id, metric) instead of the primary key
+        connection.execute(update(UserWorkoutMetrics).values(id=UserWorkoutMetrics.id + 10 ** 6, value=0))
+
+    stats = init_db.copy_database(str(engine.url), str(target.url), on_conflict='upsert', exclude=exclude)
+
+    metrics = next(table for table in stats if table[0] == UserWorkoutMetrics.__tablename__)
+    assert metrics[2] == 0
+    with target.connect() as connection:
+        copied = connection.execute(select(UserWorkoutMetrics.set_id, UserWorkoutMetrics.metric,
+                                           UserWorkoutMetrics.value)).all()
+    expected = session.exec(select(UserWorkoutMetrics.set_id, UserWorkoutMetrics.metric,
+                                   UserWorkoutMetrics.value)).all()
+    assert sorted(copied) == sorted(expected)
+    target.dispose()
+
+
+class PostgresConnection:
+    """Records the statements run on a Postgres target, compiled."""
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, statement):
+        self.executed.append(str(statement.compile(dialect=self.dialect)))
+
+    def commit(self):
+        pass
+
+
+def test_postgres_sequences_move_past_the_copied_ids():
+    connection = PostgresConnection()
+
+    init_db.reset_sequence(connection, Workout.__table__)
+
+    [statement] = connection.executed
+    assert statement.startswith('SELECT setval(pg_get_serial_sequence(')
+    assert 'coalesce(max(workouts.id)' in statement
+    assert statement.endswith('FROM workouts')
@@ -0,0 +1,68 @@
+"""The database reads of the event handlers on Postgres and asyncpg.
+
+They run when DATABASE_URL points at a Postgres database the tests may empty, like the db service of compose.yaml:
+
+    DATABASE_URL=postgresql://base45:<password>@localhost:5432/base45 python -m pytest tests/test_postgres.py
+"""
+import asyncio
+import os
+import types
+
+import pytest
+from sqlmodel import Session, SQLModel, delete, select
+
+import calculate_metrics
+from base45reflex import database
+from base45reflex.pages import index
+from base45reflex.pages.workout import WorkoutState
+from base45reflex.SQLModels import User, UserIndicatorPayload, UserMetricSummary, Workout
+from tests.seed import START, athlete_id, seed
+
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL.startswith('postgresql'),
+                                reason="DATABASE_URL does not point at a Postgres database")
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    """An empty schema in the DATABASE_URL database, with database.async_session() on asyncpg pointed at it."""
+    pytest.importorskip('psycopg2')
+    pytest.importorskip('asyncpg')
+    engine = database.create_engine(DATABASE_URL)
+    SQLModel.metadata.drop_all(engine)
+    monkeypatch.setattr(database.config, 'db_url', DATABASE_URL)
+    monkeypatch.setattr(database, '_async_engine', None)
+    yield engine
+    if database._async_engine is not None:
+        asyncio.run(database._async_engine.dispose())
+    SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_load_day_reads_the_history_on_asyncpg(postgres):
+    seed(postgres, athletes=1, weeks=4)
+    with Session(postgres) as session:
+        calculate_metrics.calculate_metrics(session.get(User, athlete_id(0)), session)
+        session.exec(delete(UserIndicatorPayload))
+        session.exec(delete(UserMetricSummary))
+        session.commit()
+        expected = index.day_indicators(session, athlete_id(0), 1, START)
+    state = types.SimpleNamespace(user={'id': athlete_id(0)}, day_indicators={}, program_start_date=START.isoformat(),
+                                  user_program=[{'id': 1, 'name': 'Day 1'}])
+
+    asyncio.run(index.LandingState.load_day.fn(state, 'Day 1'))
+
+    assert state.day_indicators == {'Day 1': expected}
+
+
+def test_load_history_pages_on_asyncpg(postgres):
+    seed(postgres, athletes=1, weeks=30)
+    with Session(postgres) as session:
+        expected = session.exec(select(Workout.id).order_by(Workout.date.desc(), Workout.id.desc())).all()
+    state = types.SimpleNamespace(user={'id': athlete_id(0)}, history=[], history_complete=False)
+
+    while not state.history_complete:
+        asyncio.run(WorkoutState.load_history.fn(state))
+
+    assert [workout['id'] for workout in state.history] == expected
@@ -0,0 +1,55 @@
+from sqlalchemy import insert
+from sqlmodel import select
+
+import predict_loads
+from base45reflex.SQLModels import InputFeatures, Prediction
+from tests.seed import seed
+
+
+def test_nothing_is_predicted_without_history(engine, session):
+    seed(engine, athletes=2, weeks=0)
+
+    assert predict_loads.predict_loads(session) == 0
+    assert session.exec(select(Prediction)).all() == []
+
+
+def test_reviewed_program_sets_keep_their_one_prediction(engine, session):
+    seed(engine, athletes=1, weeks=4)
+    stored = predict_loads.predict_loads(session)
+    agreed, corrected, *_ = session.exec(select(Prediction).order_by(Prediction.program_set_id)).all()
+    agreed.user_agrees = True
+    corrected.user_suggestion = corrected.prediction + 5
+    session.add_all([agreed, corrected])
+    session.commit()
+
+    assert predict_loads.predict_loads(session) == stored - 2
+
+    predictions = session.exec(select(Prediction)).all()
+    assert len(predictions) == stored
+    assert len({(row.user_id, row.program_set_id, row.model) for row in predictions}) == stored
+    kept = {row.program_set_id: row for row in predictions}
+    assert kept[agreed.program_set_id].user_agrees
+    assert kept[corrected.program_set_id].user_suggestion == corrected.user_suggestion
+
+
+def test_features_another_run_stored_first_are_shared(engine, session, monkeypatch):
+    seed(engine, athletes=2, weeks=4)
+    stored_features = predict_loads.stored_features
+    other_run = []
+
+    def racing_stored_features(sess):
+        features = stored_features(sess)
+        if not other_run:
+            # Every seeded program set is 5 to 8 reps at RPE 8. SQLite lets one writer in at a time, the other run's
+            # row is written on the connection of this one.
+            result = sess.execute(insert(InputFeatures.__table__)
+                                  .values(reps=6, reps_max=8, reps_min=5, rpe=8.0, set_number=1))
+            other_run.extend(result.inserted_primary_key)
+        return features
+
+    monkeypatch.setattr(predict_loads, 'stored_features', racing_stored_features)
+    stored = predict_loads.predict_loads(session)
+
+    assert stored > 0
+    assert session.exec(select(InputFeatures.id)).all() == other_run
+    assert set(session.exec(select(Prediction.input_id)).all()) == set(other_run)
@@ -0,0 +1,90 @@
+import datetime
+
+import pandas as pd
+import pytest
+from sqlmodel import select
+
+import calculate_metrics
+import project_programs
+from base45reflex.reference import get_reference
+from base45reflex.SQLModels import User, UserProgramHistory, UserProgramHistoryPrediction
+from tests.seed import START, athlete_id, seed
+
+LBS, KG = 1, 2
+
+END = START + datetime.timedelta(days=28)
+
+
+@pytest.fixture
+def reference(engine, session):
+    seed(engine, athletes=0, weeks=0)
+    return get_reference(session)
+
+
+def metric_rows(rows) -> pd.DataFrame:
+    """TotalLoad rows of one program from START to END, from (exercise_id, day, unit_id, value) tuples."""
+    return pd.DataFrame([{'user_program_history_id': 1, 'start_date': START, 'end_date': END, 'set_id': set_id,
+                          'date': START + datetime.timedelta(days=day), 'exercise': str(exercise_id),
+                          'exercise_id': exercise_id, 'unit_id': unit_id, 'value': value}
+                         for set_id, (exercise_id, day, unit_id, value) in enumerate(rows, 1)])
+
+
+def trends(metrics: pd.DataFrame, reference) -> dict:
+    fitted = project_programs.fit_trends(metrics, reference)
+    return {row.exercise_id: (row.unit_id, row.value) for row in fitted.itertuples()}
+
+
+def test_a_trend_follows_its_slope_to_the_end_date(reference):
+    metrics = metric_rows([(1, day, KG, 100 + 2 * day) for day in (0, 7, 14)] +
+                          [(2, day, KG, 80 - 0.5 * day) for day in (3, 10, 17)] +
+                          [(3, day, KG, 30 - 2 * day) for day in (0, 7)])
+
+    assert trends(metrics, reference) == {1: (KG, 156), 2: (KG, 66), 3: (KG, 0)}
+
+
+def test_a_single_day_is_a_flat_line_through_its_mean(reference):
+    metrics = metric_rows([(1, 5, KG, 100), (1, 5, KG, 110), (2, 9, LBS, 60)])
+
+    assert trends(metrics, reference) == {1: (KG, 105), 2: (LBS, 60)}
+
+
+def test_a_trend_is_in_the_unit_of_the_latest_set(reference):
+    kilos = [(day, 50 + day) for day in (0, 7, 14, 21)]
+    metrics = metric_rows([(1, day, LBS, value * 2.20462) for day, value in kilos[:2]] +
+                          [(1, day, KG, value) for day, value in kilos[2:]] +
+                          [(2, day, KG, value) for day, value in kilos[:2]] +
+                          [(2, day, LBS, value * 2.20462) for day, value in kilos[2:]])
+
+    fitted = trends(metrics, reference)
+
+    assert fitted[1] == (KG, 78)
+    assert fitted[2][0] == LBS and fitted[2][1] == pytest.approx(78 * 2.20462, abs=0.01)
+
+
+def test_a_run_replaces_only_the_projections_of_current_programs(engine, session):
+    seed(engine, athletes=2, weeks=6)
+    for number in range(2):
+        calculate_metrics.calculate_metrics(session.get(User, athlete_id(number)), session)
+    earlier = UserProgramHistory(user_id=athlete_id(0), current=False, program_id=1,
+                                 start_date=START - datetime.timedelta(weeks=8), end_date=START)
+    session.add(earlier)
+    session.commit()
+    current = session.exec(select(UserProgramHistory).where(UserProgramHistory.current == True)).all()
+    # A projection of the earlier program, and a stale one of a current program on an exercise no longer in it
+    session.add(UserProgramHistoryPrediction(user_program_history_id=earlier.id, program_day_id=1, exercise_id=1,
+                                             unit_id=LBS, value=123))
+    session.add(UserProgramHistoryPrediction(user_program_history_id=current[0].id, program_day_id=1, exercise_id=4,
+                                             unit_id=LBS, value=456))
+    session.commit()
+
+    stored = project_programs.project_programs(session)
+
+    rows = session.exec(select(UserProgramHistoryPrediction)).all()
+    projected = {(row.user_program_history_id, row.program_day_id, row.exercise_id): row.value for row in rows}
+    assert stored == 2 * 4
+    assert projected.pop((earlier.id, 1, 1)) == 123
+    assert set(projected) == {(history.id, day, exercise_id) for history in current
+                              for day, exercises in ((1, (1, 2)), (2, (3, 4))) for exercise_id in exercises}
+
+    assert project_programs.project_programs(session) == stored
+    assert len(session.exec(select(UserProgramHistoryPrediction)).all()) == len(rows)
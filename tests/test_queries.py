@@ -0,0 +1,104 @@
+import asyncio
+import types
+
+import pytest
+from sqlmodel import select
+
+import calculate_metrics
+from base45reflex import queries
+from base45reflex.pages.workout import WorkoutState, workout_details
+from base45reflex.SQLModels import User, Workout
+from tests.seed import COACH_ID, athlete_id, seed
+
+
+@pytest.mark.parametrize('weeks', [2, 40, 300])
+def test_workouts_with_sets_runs_three_statements(engine, session, statements, weeks):
+    seed(engine, athletes=1, weeks=weeks)
+    calculate_metrics.calculate_metrics(session.get(User, athlete_id(0)), session)
+    session.expunge_all()
+
+    statements.clear()
+    workouts = queries.workouts_with_sets(session, athlete_id(0))
+    loaded = [(workout.day.name, workout_set.weight, {metric.metric for metric in workout_set.metrics})
+              for workout in workouts for workout_set in workout.workout_sets]
+
+    assert len(workouts) == weeks * 2
+    assert len(loaded) == weeks * 4
+    assert all(metrics >= set(calculate_metrics.METRICS) for _, _, metrics in loaded)
+    assert len(statements) == 3
+
+
+def test_workouts_with_sets_between_dates(engine, session):
+    seed(engine, athletes=1, weeks=4)
+    dates = session.exec(select(Workout.date).order_by(Workout.date)).all()
+
+    workouts = queries.workouts_with_sets(session, athlete_id(0), dates[2], dates[5])
+
+    assert [workout.date for workout in workouts] == dates[2:6]
+
+
+def test_workout_details(engine, session):
+    seed(engine, athletes=1, weeks=2)
+    calculate_metrics.calculate_metrics(session.get(User, athlete_id(0)), session)
+    workout = session.exec(select(Workout).order_by(Workout.id)).first()
+
+    details = workout_details(session, workout.id)
+
+    assert details['id'] == workout.id
+    assert details['day'] == 'Day 1'
+    assert [workout_set['exercise'] for workout_set in details['sets']] == ['Squat', 'Bench']
+    assert 'TotalLoad' in details['sets'][0]['metrics']
+    assert workout_details(session, 10 ** 6) == {}
+
+
+def test_client_workouts_page_walks_every_client_workout(engine, session):
+    seed(engine, athletes=3, weeks=4, clients=2)
+    expected = session.exec(select(Workout.id).where(Workout.user_id.in_([athlete_id(0), athlete_id(1)]))
+                            .order_by(Workout.date.desc(), Workout.id.desc())).all()
+
+    pages, after = [], None
+    while True:
+        page = queries.client_workouts_page(session, COACH_ID, after, limit=5)
+        pages.append([workout.id for workout in page])
+        if len(page) < 5:
+            break
+        after = (page[-1].date, page[-1].id)
+
+    assert [workout_id for page in pages for workout_id in page] == expected
+    assert all(len(page) == 5 for page in pages[:-1])
+
+
+@pytest.mark.parametrize('handler, user_id, rows, complete', [
+    (WorkoutState.load_history, athlete_id(0), 'history', 'history_complete'),
+    (WorkoutState.load_client_history, COACH_ID, 'client_history', 'client_history_complete'),
+])
+def test_history_handlers_page_on_the_async_session(engine, session, async_database, handler, user_id, rows,
+                                                    complete):
+    seed(engine, athletes=3, weeks=30, clients=2)
+    athletes = [athlete_id(0)] if user_id == athlete_id(0) else [athlete_id(0), athlete_id(1)]
+    expected = session.exec(select(Workout.id).where(Workout.user_id.in_(athletes))
+                            .order_by(Workout.date.desc(), Workout.id.desc())).all()
+    state = types.SimpleNamespace(user={'id': user_id}, **{rows: [], complete: False})
+
+    pages = 0
+    while not getattr(state, complete):
+        asyncio.run(handler.fn(state))
+        pages += 1
+
+    assert [workout['id'] for workout in getattr(state, rows)] == expected
+    assert pages == len(expected) // queries.HISTORY_PAGE_SIZE + 1
+
+
+@pytest.mark.parametrize('clients', [1, 50, 500])
+def test_client_access_runs_one_statement_for_any_number_of_clients(engine, session, statements, clients):
+    seed(engine, athletes=clients, weeks=1, clients=clients)
+    last_client = session.exec(select(Workout.id).where(Workout.user_id == athlete_id(clients - 1))).first()
+
+    statements.clear()
+    assert queries.can_view_workout(session, COACH_ID, last_client)
+    assert len(statements) == 1
+
+    statements.clear()
+    page = queries.client_workouts_page(session, COACH_ID)
+    assert len(page) == min(clients * 2, queries.HISTORY_PAGE_SIZE)
+    assert len(statements) == 1
@@ -0,0 +1,35 @@
+import pytest
+from sqlmodel import select
+
+from base45reflex import reference
+from base45reflex.SQLModels import Exercise, UnitConversion
+from tests.seed import seed
+
+
+@pytest.fixture
+def expired(monkeypatch):
+    """Every get_reference call checks the version."""
+    monkeypatch.setattr(reference, 'CHECK_INTERVAL', -1)
+
+
+def test_in_place_updates_reload_the_reference(engine, session, expired):
+    seed(engine, athletes=0)
+    assert reference.get_reference(session).exercises[4]['weight_step'] == 5
+
+    row = session.get(Exercise, 4)
+    row.weight_step, row.name = 2.5, 'Pendlay Row'
+    conversion = session.exec(select(UnitConversion).where(UnitConversion.second_unit == 1)).one()
+    conversion.factor = 2.2
+    session.add_all([row, conversion])
+    session.commit()
+
+    loaded = reference.get_reference(session)
+    assert loaded.exercises[4]['weight_step'] == 2.5
+    assert loaded.exercise_names[4] == 'Pendlay Row'
+    assert loaded.unit_conversions[conversion.id]['factor'] == 2.2
+
+
+def test_unchanged_tables_keep_the_cached_copy(engine, session, expired):
+    seed(engine, athletes=0)
+
+    assert reference.get_reference(session) is reference.get_reference(session)